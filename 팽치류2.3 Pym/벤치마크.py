@@ -0,0 +1,375 @@
+import os
+import argparse
+import base64
+import gzip
+import hashlib
+import importlib.util
+import json
+import math
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# 같은 폴더의 변환기 스크립트
+CONVERTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '팽치류ver2_40planet.py')
+
+# 디스플레이 종류 이름 -> .bdengine 플래그
+DISPLAY_FLAGS = {
+    'block': 'isBlockDisplay',
+    'item': 'isItemDisplay',
+    'text': 'isTextDisplay',
+}
+
+# 움직임 종류
+MOTION_PATTERNS = ('static', 'spin', 'bob', 'wave', 'random')
+
+# 기본 벤치마크 케이스 (이름 -> 생성 옵션)
+BENCHMARK_CASES = {
+    'small': dict(entities=50, frames=20, depth=2),
+    'medium': dict(entities=400, frames=40, depth=3),
+    'deep': dict(entities=400, frames=40, depth=8),
+    'heads': dict(entities=400, frames=40, depth=3, heads=0.5, textures=16),
+    'static': dict(entities=1000, frames=40, depth=4, moving=0.1),
+    'rig': dict(entities=1000, frames=40, depth=4, moving=0.2, moving_leaves=0.0),
+}
+
+# 벤치마크용 setting.txt
+BENCHMARK_SETTINGS = {
+    '생성모드': '1',
+    '임시플레이어(선택)': 'frame',
+    '스코어 이름(선택)': 'anim',
+    '기본 보간값(선택)': '1',
+    '시작 스코어 값(선택)': '0',
+    '네임스페이스': 'bench:anim/',
+    'score저장이름(기본값frame)': '',
+    'frame저장위치(선택)': '',
+    'score저장위치(선택)': '',
+}
+
+
+# y축 회전, 이동, 균일 크기로 4x4 행렬(16개 값)을 만드는 함수
+def make_matrix(tx, ty, tz, angle, scale=1.0):
+    c, s = math.cos(angle), math.sin(angle)
+    return [round(v, 6) for v in (c * scale, 0, s * scale, tx,
+                                  0, scale, 0, ty,
+                                  -s * scale, 0, c * scale, tz,
+                                  0, 0, 0, 1)]
+
+
+# 움직임 종류에 맞는 프레임별 로컬 행렬을 만드는 함수
+def motion_matrix(pattern, base, phase, frame, rnd):
+    tx, ty, tz, angle = base
+    t = frame * 0.1
+    if pattern == 'spin':
+        return make_matrix(tx, ty, tz, angle + t)
+    if pattern == 'bob':
+        return make_matrix(tx, ty + 0.25 * math.sin(t + phase), tz, angle)
+    if pattern == 'wave':
+        return make_matrix(tx, ty + 0.1 * math.sin(t * 2 + phase), tz, angle + 0.3 * math.sin(t + phase),
+                           1.0 + 0.1 * math.sin(t + phase))
+    if pattern == 'random':
+        return make_matrix(tx + rnd.uniform(-0.1, 0.1), ty + rnd.uniform(-0.1, 0.1), tz, angle + rnd.uniform(-0.5, 0.5))
+    return make_matrix(tx, ty, tz, angle)
+
+
+# "block:5,item:3,text:2" 형식의 디스플레이 비율을 읽는 함수
+def parse_display_mix(text):
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition(':')
+        name = name.strip()
+        if name not in DISPLAY_FLAGS:
+            raise ValueError(f"알 수 없는 디스플레이 종류: {name}")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+# 합성 .bdengine 애니메이션(f0.bdengine ~ f<N-1>.bdengine)을 만드는 함수
+def generate_animation(output_folder, entities=100, frames=20, depth=2, display_mix='block:5,item:3,text:2',
+                       heads=0.0, textures=4, texture_change=0.1, moving=0.5, moving_leaves=None, motion='wave', seed=1):
+    if motion not in MOTION_PATTERNS:
+        raise ValueError(f"알 수 없는 움직임 종류: {motion}")
+    rnd = random.Random(seed)
+    weights = parse_display_mix(display_mix)
+    display_names = list(weights)
+    texture_pool = [base64.b64encode(json.dumps(
+        {'textures': {'SKIN': {'url': f'http://textures.minecraft.net/texture/{rnd.getrandbits(128):032x}'}}}).encode()).decode()
+        for _ in range(max(textures, 1))]
+
+    # 컬렉션 트리: 깊이마다 몇 개의 컬렉션을 두고, 엔티티를 임의의 컬렉션 아래에 배치
+    collections = [dict(parent=None, level=0)]
+    for level in range(1, depth):
+        parents = [i for i, c in enumerate(collections) if c['level'] == level - 1]
+        for _ in range(max(1, entities // (8 * depth))):
+            collections.append(dict(parent=rnd.choice(parents), level=level))
+    for c in collections:
+        c['base'] = (rnd.uniform(-1, 1), rnd.uniform(0, 1), rnd.uniform(-1, 1), rnd.uniform(0, math.pi))
+        c['phase'] = rnd.uniform(0, math.pi * 2)
+        c['motion'] = motion if c['parent'] is not None and rnd.random() < moving else 'static'
+
+    leaves = []
+    for i in range(entities):
+        display_name = rnd.choices(display_names, weights=[weights[n] for n in display_names])[0]
+        leaves.append(dict(
+            collection=rnd.randrange(len(collections)),
+            flag=DISPLAY_FLAGS[display_name],
+            nbt=f'Tags:["bench{i}"]',
+            head=display_name == 'item' and rnd.random() < heads,
+            texture=rnd.randrange(len(texture_pool)),
+            base=(rnd.uniform(-2, 2), rnd.uniform(0, 2), rnd.uniform(-2, 2), rnd.uniform(0, math.pi)),
+            phase=rnd.uniform(0, math.pi * 2),
+            motion=motion if rnd.random() < (moving if moving_leaves is None else moving_leaves) else 'static'))
+
+    os.makedirs(output_folder, exist_ok=True)
+    for frame in range(frames):
+        frame_rnd = random.Random(seed * 100003 + frame)
+        nodes = []
+        for c in collections:
+            node = {'isCollection': True, 'nbt': '', 'children': [],
+                    'transforms': motion_matrix(c['motion'], c['base'], c['phase'], frame, frame_rnd)}
+            nodes.append(node)
+            if c['parent'] is not None:
+                nodes[c['parent']]['children'].append(node)
+        for leaf in leaves:
+            child = {leaf['flag']: True, 'nbt': leaf['nbt'],
+                     'transforms': motion_matrix(leaf['motion'], leaf['base'], leaf['phase'], frame, frame_rnd)}
+            if leaf['head']:
+                if frame > 0 and frame_rnd.random() < texture_change:
+                    leaf['texture'] = frame_rnd.randrange(len(texture_pool))
+                child['tagHead'] = {'Value': texture_pool[leaf['texture']]}
+            nodes[leaf['collection']]['children'].append(child)
+        raw = base64.b64encode(gzip.compress(json.dumps([nodes[0]]).encode('utf-8')))
+        with open(os.path.join(output_folder, f'f{frame}.bdengine'), 'wb') as f:
+            f.write(raw)
+    return entities * frames
+
+
+# 쿼터니언 [x, y, z, w]를 3x3 행렬로 만드는 함수 (단위 쿼터니언이 아니면 회전이 아닌 행렬이 나옴)
+def quaternion_matrix(x, y, z, w):
+    return [[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]]
+
+
+# 임의의 회전 행렬(3x3)을 만드는 함수 (균일한 단위 쿼터니언에서)
+def random_rotation(rnd):
+    x, y, z, w = (rnd.gauss(0, 1) for _ in range(4))
+    n = math.sqrt(x * x + y * y + z * z + w * w)
+    return quaternion_matrix(x / n, y / n, z / n, w / n)
+
+
+# 회전 * 축별 스케일 (shear면 여기에 회전 * 스케일을 한 번 더 곱한 기울어진 행렬)을 4x4 행렬(16개 값)로 만드는 함수
+def random_decompose_matrix(rnd, shear, step):
+    def scaled(rotation):
+        kind = rnd.choice(('uniform', 'pair', 'distinct', 'mirror', 'zero', 'flat'))
+        s = rnd.uniform(0.2, 3)
+        scale = {'uniform': [s] * 3, 'pair': [s, s, rnd.uniform(0.2, 3)], 'distinct': [rnd.uniform(0.2, 3) for _ in range(3)],
+                 'mirror': [s, s, -s], 'zero': [s, s, 0.0], 'flat': [s, rnd.uniform(0.2, 3), rnd.uniform(-1e-6, 1e-6)]}[kind]
+        rnd.shuffle(scale)
+        return [[rotation[row][col] * scale[col] for col in range(3)] for row in range(3)]
+    a = scaled(random_rotation(rnd))
+    if shear:
+        b = scaled(random_rotation(rnd))
+        a = [[sum(a[row][k] * b[k][col] for k in range(3)) for col in range(3)] for row in range(3)]
+    values = [a[0][0], a[0][1], a[0][2], rnd.uniform(-2, 2),
+              a[1][0], a[1][1], a[1][2], rnd.uniform(-2, 2),
+              a[2][0], a[2][1], a[2][2], rnd.uniform(-2, 2), 0, 0, 0, 1]
+    return [round(v / step) * step for v in values] if step else [round(v, 6) for v in values]
+
+
+# 분해 결과 문자열 (translation:[...], left_rotation:[...], scale:[...], right_rotation:[...])을 다시 행렬(16개 값)로 합치는 함수
+def recompose_matrix(components):
+    translation, left, scale, right = ([float(value.rstrip('f')) for value in component[component.index('[') + 1:-1].split(',')]
+                                        for component in components)
+    l, r = quaternion_matrix(*left), quaternion_matrix(*right)
+    a = [[sum(l[row][k] * scale[k] * r[k][col] for k in range(3)) for col in range(3)] for row in range(3)]
+    return [a[0][0], a[0][1], a[0][2], translation[0],
+            a[1][0], a[1][1], a[1][2], translation[1],
+            a[2][0], a[2][1], a[2][2], translation[2], 0, 0, 0, 1]
+
+
+# 분해 결과를 다시 합친 행렬과 원래 행렬이 허용할 수 있는 차이 (분해 오차 범위 밖, 출력의 소수 4자리 반올림 몫)
+RECOMPOSE_ROUNDING = 1e-3
+
+
+# 변환기의 행렬 분해가 numpy 경로와 순수 파이썬 경로에서 같은 문자열을 내는지, 다시 합치면 원래 행렬이 되는지
+# 확인하는 함수 (다르거나 원래 행렬과 어긋난 행렬 수를 돌려줌)
+def check_decompose(count, seed):
+    spec = importlib.util.spec_from_file_location('bdengine_converter', CONVERTER_PATH)
+    converter = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(converter)
+    if converter.np is None:
+        raise RuntimeError("numpy가 없어 두 경로를 비교할 수 없습니다.")
+    rnd = random.Random(seed)
+    different = 0
+    for shear in (False, True):
+        for step in (None, 0.001):
+            matrices = [random_decompose_matrix(rnd, shear, step) for _ in range(count)]
+            tolerance = max(converter.DECOMPOSE_TOLERANCE, step or 0.0)
+            with_numpy = converter.decompose_transforms(matrices, tolerance)
+            numpy_module, converter.np = converter.np, None
+            try:
+                without_numpy = converter.decompose_transforms(matrices, tolerance)
+            finally:
+                converter.np = numpy_module
+            mismatches = [(m, a, b) for m, a, b in zip(matrices, with_numpy, without_numpy) if a != b]
+            for matrix, a, b in mismatches[:3]:
+                print(f"  {matrix}\n    numpy:  {a}\n    python: {b}")
+            # 분해 오차는 행렬의 가장 큰 성분에 비례하므로 그 크기에 맞춰 비교
+            errors = [(max(abs(x - y) for x, y in zip(recompose_matrix(components), matrix))
+                       / max(1.0, max(abs(x) for x in matrix[:12])), matrix, components)
+                      for matrix, components in zip(matrices, without_numpy)]
+            failures = [error for error in errors if error[0] > tolerance + RECOMPOSE_ROUNDING]
+            for error, matrix, components in failures[:3]:
+                print(f"  {matrix}\n    분해: {components}\n    오차: {error:.6f}")
+            print(f"{'기울임' if shear else '회전+스케일':<8} 양자화 {step or '없음':<6} {count}개 중 {len(mismatches)}개 다름, "
+                  f"{len(failures)}개 원래 행렬과 어긋남 (최대 오차 {max(error for error, _, _ in errors):.6f})")
+            different += len(mismatches) + len(failures)
+    return different
+
+
+# 폴더 안의 모든 출력 파일 내용으로 해시를 만드는 함수 (실행 간 출력 비교용)
+def digest_output(folder):
+    digest = hashlib.sha256()
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, folder).replace(os.sep, '/').encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+# 케이스 하나를 만들고 변환기를 여러 번 실행해 가장 빠른 결과를 기록하는 함수
+def run_case(name, options, repeat, converter_args, settings, keep_folder=None):
+    work_folder = tempfile.mkdtemp(prefix=f'bdengine_bench_{name}_')
+    try:
+        total_entities = generate_animation(work_folder, **options)
+        os.makedirs(os.path.join(work_folder, 'result'))
+        with open(os.path.join(work_folder, 'setting.txt'), 'w', encoding='utf-8') as f:
+            for key, value in settings.items():
+                f.write(f"{key} :{value}\n")
+
+        report_path = os.path.join(work_folder, 'conversion_report.json')
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, CONVERTER_PATH, '--profile', report_path] + converter_args,
+                           cwd=work_folder, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - start)
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+        seconds = min(timings)
+        result = {
+            'case': name,
+            'options': options,
+            'seconds': seconds,
+            'timings': timings,
+            'frames_per_s': options.get('frames', 20) / seconds,
+            'entities_per_s': total_entities / seconds,
+            'peak_memory': report.get('peak_memory'),
+            'lines': report['totals'].get('lines', 0),
+            'output_bytes': report['totals'].get('output_bytes', 0),
+            'stages': {stage: record['wall'] for stage, record in report['stages'].items()},
+            'output_digest': digest_output(os.path.join(work_folder, 'result')),
+        }
+        if keep_folder:
+            shutil.copytree(work_folder, os.path.join(keep_folder, name), dirs_exist_ok=True)
+        return result
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+# 이전 결과와 비교해 속도 비율과 출력 일치 여부를 출력하는 함수, 출력이 다르면 False
+def compare_results(previous, results):
+    previous_cases = {r['case']: r for r in previous['results']}
+    identical = True
+    for result in results:
+        old = previous_cases.get(result['case'])
+        if old is None:
+            continue
+        same_output = old['output_digest'] == result['output_digest'] and old['options'] == result['options']
+        identical &= same_output
+        print(f"  {result['case']:<10} {old['seconds'] / result['seconds']:6.2f}배  "
+              f"출력 {'동일' if same_output else '다름!'}")
+    return identical
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='합성 .bdengine 애니메이션을 만들고 변환 속도를 측정합니다.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='합성 .bdengine 파일만 생성')
+    generate_parser.add_argument('folder')
+    generate_parser.add_argument('--entities', type=int, default=100, help='엔티티 수')
+    generate_parser.add_argument('--frames', type=int, default=20, help='프레임 수')
+    generate_parser.add_argument('--depth', type=int, default=2, help='isCollection 중첩 깊이')
+    generate_parser.add_argument('--display-mix', default='block:5,item:3,text:2', help='디스플레이 종류 비율')
+    generate_parser.add_argument('--heads', type=float, default=0.0, help='머리 텍스처를 가진 아이템 디스플레이 비율')
+    generate_parser.add_argument('--textures', type=int, default=4, help='서로 다른 머리 텍스처 수')
+    generate_parser.add_argument('--texture-change', type=float, default=0.1, help='프레임마다 머리 텍스처가 바뀔 확률')
+    generate_parser.add_argument('--moving', type=float, default=0.5, help='움직이는 엔티티/컬렉션 비율')
+    generate_parser.add_argument('--moving-leaves', type=float, default=None, help='움직이는 엔티티 비율 (없으면 --moving)')
+    generate_parser.add_argument('--motion', choices=MOTION_PATTERNS, default='wave', help='움직임 종류')
+    generate_parser.add_argument('--seed', type=int, default=1)
+
+    run_parser = subparsers.add_parser('run', help='벤치마크 실행')
+    run_parser.add_argument('--cases', default=','.join(BENCHMARK_CASES), help='실행할 케이스 (쉼표로 구분)')
+    run_parser.add_argument('--repeat', type=int, default=3, help='케이스마다 반복 실행 횟수 (가장 빠른 값 기록)')
+    run_parser.add_argument('--output', default='benchmark_result.json', help='결과 JSON 경로')
+    run_parser.add_argument('--compare', default=None, metavar='PATH', help='이전 결과 JSON과 비교 (출력이 다르면 종료 코드 1)')
+    run_parser.add_argument('--keep', default=None, metavar='FOLDER', help='입력과 출력 파일을 이 폴더에 보관')
+    run_parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='setting.txt 값 덮어쓰기')
+    run_parser.add_argument('converter_args', nargs=argparse.REMAINDER, help='-- 뒤의 인자는 변환기에 그대로 전달')
+
+    decompose_parser = subparsers.add_parser('decompose', help='행렬 분해의 numpy/순수 파이썬 결과가 같고 다시 합치면 원래 행렬이 되는지 확인 (아니면 종료 코드 1)')
+    decompose_parser.add_argument('--count', type=int, default=2000, help='종류마다 확인할 행렬 수')
+    decompose_parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        generate_animation(args.folder, entities=args.entities, frames=args.frames, depth=args.depth,
+                           display_mix=args.display_mix, heads=args.heads, textures=args.textures,
+                           texture_change=args.texture_change, moving=args.moving, moving_leaves=args.moving_leaves,
+                           motion=args.motion, seed=args.seed)
+        sys.exit(0)
+
+    if args.command == 'decompose':
+        sys.exit(1 if check_decompose(args.count, args.seed) else 0)
+
+    settings = dict(BENCHMARK_SETTINGS)
+    for item in args.set:
+        key, _, value = item.partition('=')
+        settings[key] = value
+    converter_args = [a for a in args.converter_args if a != '--']
+
+    results = []
+    for name in args.cases.split(','):
+        result = run_case(name, BENCHMARK_CASES[name], args.repeat, converter_args, settings, args.keep)
+        peak_memory = f"{result['peak_memory'] / (1024 * 1024):7.1f}MB" if result['peak_memory'] else '      ?'
+        print(f"{name:<10} {result['seconds']:7.3f}s  {result['frames_per_s']:8.1f} 프레임/s  "
+              f"{result['entities_per_s']:10.0f} 엔티티/s  {peak_memory}  {result['output_digest'][:12]}")
+        results.append(result)
+
+    benchmark = {
+        'python': sys.version,
+        'platform': platform.platform(),
+        'converter_args': converter_args,
+        'settings': settings,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(benchmark, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print("이전 결과 대비:")
+        if not compare_results(previous, results):
+            sys.exit(1)
@@ -1,24 +1,132 @@
 import os
+import argparse
 import base64
+import codecs
 import gzip
+import hashlib
+import io
 import json
+import math
+import mmap
+import pickle
 import re
+import sys
+import time
+import zipfile
+import zlib
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache, partial
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError:  # 임베디드 파이썬에는 numpy가 없을 수 있으므로 순수 파이썬 경로로 대체
+    np = None
+
+
+# 단계별 실행 시간과 프레임별 변환 통계를 모으는 클래스 (--profile)
+class ConversionProfiler:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {}  # 단계 이름 -> {'wall', 'cpu', 'calls'}
+        self.frames = {}  # 출력 파일 -> 프레임 통계
+        self.ticks = {}   # 스코어(틱) -> 그 틱에 실행되는 프레임 명령 수
+
+    # with 블록 하나의 실제 시간과 CPU 시간을 단계에 더함
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            record['wall'] += time.perf_counter() - wall_start
+            record['cpu'] += time.process_time() - cpu_start
+            record['calls'] += 1
+
+    # 프레임 하나의 통계를 더함
+    def count_frame(self, frame_path, **counts):
+        if not self.enabled:
+            return
+        stats = self.frames.setdefault(frame_path, {})
+        for name, value in counts.items():
+            stats[name] = stats.get(name, 0) + value
+
+    # 틱마다 실행되는 프레임 명령 수를 기록
+    def count_ticks(self, tick_commands):
+        if not self.enabled:
+            return
+        self.ticks = dict(tick_commands)
+
+    # 프레임 통계의 합계
+    def totals(self):
+        totals = {}
+        for stats in self.frames.values():
+            for name, value in stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    # JSON 보고서 저장
+    def write_report(self, report_path):
+        report = {
+            'stages': self.stages,
+            'totals': self.totals(),
+            'peak_memory': peak_memory_bytes(),
+            'frames': [dict(frame=os.path.basename(path), **stats) for path, stats in self.frames.items()],
+            'ticks': [{'score': score, 'commands': commands} for score, commands in sorted(self.ticks.items())],
+        }
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # 콘솔 요약 출력
+    def print_summary(self):
+        total_wall = sum(record['wall'] for record in self.stages.values()) or 1.0
+        print("단계별 시간 (실제 / CPU):")
+        for name, record in sorted(self.stages.items(), key=lambda item: -item[1]['wall']):
+            print(f"  {name:<14} {record['wall']:8.3f}s / {record['cpu']:8.3f}s  {record['wall'] / total_wall:6.1%}  ({record['calls']}회)")
+        totals = self.totals()
+        print(f"프레임 {len(self.frames)}개, 엔티티 {totals.get('entities', 0)}개, 출력 라인 {totals.get('lines', 0)}개 "
+              f"(비교로 제거 {totals.get('removed_by_diff', 0)}개), 텍스처 {totals.get('texture_bytes', 0)}바이트, "
+              f"출력 {totals.get('output_bytes', 0)}바이트")
+        peak_memory = peak_memory_bytes()
+        if peak_memory is not None:
+            print(f"최대 메모리 {peak_memory / (1024 * 1024):.1f}MB")
+
+# 이 프로세스의 최대 메모리 사용량(바이트)을 구하는 함수, 알 수 없으면 None
+def peak_memory_bytes():
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # 리눅스는 KB 단위
+    if os.name == 'nt':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize',
+                                                             'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                                                             'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage',
+                                                             'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                    ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
 
-config = {}
-# 파일을 읽고 설정을 딕셔너리에 저장
-with open('setting.txt', 'r', encoding='utf-8') as file:
-    for line in file:
-        # 줄 끝의 개행 문자 제거
-        line = line.strip()
-        
-        # ':' 기준으로 키와 값을 나누기
-        if ':' in line:
-            key, value = line.split(':', 1)
-            config[key] = value
-
-
+# 통계를 모으지 않을 때 쓰는 프로파일러
+NULL_PROFILER = ConversionProfiler(enabled=False)
 
 # 부모와 자식의 transforms를 곱하는 함수
 def apply_transforms(parent_transforms, child_transforms):
@@ -31,37 +139,80 @@ def apply_transforms(parent_transforms, child_transforms):
                                  parent_transforms[i * 4 + 3] * child_transforms[12 + j])
     return result
 
+# 트랜스폼 값을 문자열로 만드는 함수 (프레임 사이 비교도 이 문자열로 한다)
+def format_matrix(transforms):
+    return ",".join(f"{round(t, 4)}f" for t in transforms)
+
+# 합성한 행렬을 단위(행렬 양자화 단위(선택))의 정수배로 양자화하고, 같은 양자화 행렬은 한 번만 문자열로 만드는 클래스
+# 양자화 행렬마다 같은 (행렬, 문자열) 객체를 돌려주므로 프레임 사이 비교가 대부분 동일성 검사로 끝나고,
+# 단위보다 작은 흔들림은 바뀐 것으로 보지 않아 명령을 만들지 않는다
+class MatrixTable:
+    def __init__(self, step):
+        self.step = step
+        self.scale = 1 / step
+        self.entries = {}  # (성분별 정수, 성분별 타입) -> (양자화한 transforms, transformation 문자열)
+
+    # transforms를 양자화해 (양자화한 transforms, transformation 문자열)을 돌려줌
+    # (1과 1.0은 출력이 "1f"와 "1.0f"로 다르므로 정수 성분은 그대로 두고 타입도 키에 넣는다)
+    def intern(self, transforms):
+        types = tuple(map(type, transforms))
+        key = (tuple(t if type(t) is int else round(t * self.scale) for t in transforms), types)
+        entry = self.entries.get(key)
+        if entry is None:
+            matrix = [q if kind is int else q * self.step for q, kind in zip(key[0], types)]
+            entry = self.entries[key] = (matrix, format_matrix(matrix))
+        return entry
+
 # 트랜스폼 데이터를 포맷팅하는 함수
-def format_transformation(transforms, default_interpolation_value=None):
-    transforms_str = ",".join(f"{round(t, 4)}f" for t in transforms)
+def format_transformation(transforms_str, default_interpolation_value=None):
     if default_interpolation_value:
         return f"{{start_interpolation: 0, interpolation_duration: {default_interpolation_value}, transformation:[{transforms_str}]}}"
     else:
         return f"{{transformation:[{transforms_str}]}}"
 
+# 분해된 트랜스폼 성분을 포맷팅하는 함수
+def format_transformation_components(components_str, default_interpolation_value=None):
+    if default_interpolation_value:
+        return f"{{start_interpolation: 0, interpolation_duration: {default_interpolation_value}, transformation:{{{components_str}}}}}"
+    else:
+        return f"{{transformation:{{{components_str}}}}}"
+
         
 
+# nbt 문자열 처리에 쓰는 정규식
+UUID_NBT_PATTERN = re.compile(r'UUID:\[I;(-?\d+),(-?\d+),(-?\d+),(-?\d+)\]')
+UUID_NBT_REPLACE_PATTERN = re.compile(r'UUID:\[I;.*?\]')
+TAGS_NBT_PATTERN = re.compile(r'Tags:\[[a-zA-Z0-9_]*\],?')
+NUMBERED_TAG_PATTERN = re.compile(r'.*\D0$')
+UUID_STRING_PATTERN = re.compile(r'\b[a-zA-Z0-9]+(-[a-zA-Z0-9]+){4}\b')
+
+# 아래의 nbt 처리 함수들은 같은 nbt 문자열이면 결과가 같으므로 엔티티마다 한 번만 계산하고 이후 프레임은 캐시에서 꺼낸다
+# (캐시는 변환 한 번 동안만 쓰고 Converter.run이 끝날 때 clear_nbt_caches로 비운다)
+NBT_CACHE_SIZE = 1 << 16
+
 # UUID 변환 함수
+@lru_cache(maxsize=NBT_CACHE_SIZE)
 def convert_uuid(nbt):
-    uuid_match = re.search(r'UUID:\[I;(-?\d+),(-?\d+),(-?\d+),(-?\d+)\]', nbt)
+    uuid_match = UUID_NBT_PATTERN.search(nbt)
     if uuid_match:
-        a, b, c, d = uuid_match.groups()
-        hex_a = hex(int(a) & 0xFFFFFFFFFFFFFFFF)[2:]  # 64-bit hexadecimal
-        hex_b = hex(int(b) & 0xFFFFFFFF)[2:]          # 32-bit hexadecimal
-        hex_c = hex(int(c) & 0xFFFFFFFF)[2:]          # 32-bit hexadecimal
-        hex_d = hex(int(d) & 0xFFFFFFFF)[2:]          # 32-bit hexadecimal
-        uuid_hex = f"{hex_a}-0-{hex_b}-{hex_c}-{hex_d}"
-        nbt = re.sub(r'UUID:\[I;.*?\]', uuid_hex, nbt)  # Replace UUID with formatted string
-        nbt = re.sub(r'Tags:\[[a-zA-Z0-9_]*\],?', '', nbt)  # Tags 제거
+        # 정수 4개(상위 32비트부터)를 128비트 값으로 합쳐 8-4-4-4-12 형식으로 씀 (명령에서 엔티티를 바로 찾을 수 있는 형식)
+        value = 0
+        for part in uuid_match.groups():
+            value = (value << 32) | (int(part) & 0xFFFFFFFF)
+        hex_value = f"{value:032x}"
+        uuid_hex = f"{hex_value[:8]}-{hex_value[8:12]}-{hex_value[12:16]}-{hex_value[16:20]}-{hex_value[20:]}"
+        nbt = UUID_NBT_REPLACE_PATTERN.sub(uuid_hex, nbt)  # Replace UUID with formatted string
+        nbt = TAGS_NBT_PATTERN.sub('', nbt)  # Tags 제거
     return nbt
 
 # Tags 처리 함수
+@lru_cache(maxsize=NBT_CACHE_SIZE)
 def process_tags(nbt):
     if "Tags" in nbt:
         tags = nbt.split("Tags:[")[1].split("]")[0]
         tags = tags.split(',')
         tags = [tag.strip().replace('"', '') for tag in tags]
-        tags = [tag for tag in tags if not re.search(r'.*\D0$', tag)]
+        tags = [tag for tag in tags if not NUMBERED_TAG_PATTERN.search(tag)]
         tags_str = ','.join(tags)
         return tags_str
     return ""
@@ -74,100 +225,1648 @@ def extract_texture_value(child):
         return child['customTexture']
     return None
 
-# 출력 라인을 생성하는 함수
-def generate_output_line(mode, display_type, transformation, nbt, texture_value=None, temporary_player_name=None, scoreboard_name=None, scoreboard_start_value=None):
-    tags_str = process_tags(nbt)
-
-    if texture_value:
-        item_structure = f'item:{{id:player_head,components:{{"profile":{{properties:[{{name:textures,value:"{texture_value}"}}]}}}}}}'
-        transformation = transformation[:-1] + f', {item_structure}}}'
-
-    if mode == 0 and scoreboard_name is None and scoreboard_start_value is None:
-        if display_type == "isItemDisplay" and tags_str:
-            return f'execute if entity @s[tag={tags_str},type=item_display] run data merge entity @s {transformation}'
-        
-        if display_type == "isTextDisplay" and tags_str:
-            return f'execute if entity @s[tag={tags_str},type=text_display] run data merge entity @s {transformation}'
-        
-        if display_type == "isBlockDisplay" and tags_str:
-            return f'execute if entity @s[tag={tags_str},type=block_display] run data merge entity @s {transformation}'
-
-    if mode == 0 and display_type == "isItemDisplay" and tags_str:
-        return f'execute if entity @s[tag={tags_str},type=item_display] run data merge entity @s {transformation}'
+# display_type별 엔티티 타입
+DISPLAY_ENTITY_TYPES = {
+    "isItemDisplay": "item_display",
+    "isTextDisplay": "text_display",
+    "isBlockDisplay": "block_display",
+}
 
-    if mode == 1 and display_type == "isItemDisplay" and tags_str:
-        return f'data merge entity @e[limit=1,tag={tags_str},type=item_display] {transformation}'
+# 명령의 앞부분과 대상 엔티티를 구하는 함수
+@lru_cache(maxsize=NBT_CACHE_SIZE)
+def resolve_command_target(mode, display_type, nbt):
+    tags_str = process_tags(nbt)
+    entity_type = DISPLAY_ENTITY_TYPES.get(display_type)
 
-    if mode == 0 and display_type == "isTextDisplay" and tags_str:
-        return f'execute if entity @s[tag={tags_str},type=text_display] run data merge entity @s {transformation}'
-    
-    if mode == 1 and display_type == "isTextDisplay" and tags_str:
-        return f'data merge entity @e[limit=1,tag={tags_str},type=text_display] {transformation}'
+    if tags_str and entity_type:
+        if mode == 0:
+            return f'execute if entity @s[tag={tags_str},type={entity_type}] run ', '@s'
+        if mode == 1:
+            return '', f'@e[limit=1,tag={tags_str},type={entity_type}]'
 
-    if mode == 0 and display_type == "isBlockDisplay" and tags_str:
-        return f'execute if entity @s[tag={tags_str},type=block_display] run data merge entity @s {transformation}'
-    
-    if mode == 1 and display_type == "isBlockDisplay" and tags_str:
-        return f'data merge entity @e[limit=1,tag={tags_str},type=block_display] {transformation}'
-
-    if re.search(r'\b[a-zA-Z0-9]+(-[a-zA-Z0-9]+){4}\b', nbt):
+    if UUID_STRING_PATTERN.search(nbt):
         nbt = nbt.replace(display_type, "")
         nbt = nbt.strip()
-        return f'data merge entity {nbt} {transformation}'
+        return '', nbt
 
     if mode == 0:
-        return f'as {display_type} {nbt} run data merge entity @s {transformation}'
+        return f'as {display_type} {nbt} run ', '@s'
     else:
-        return f'data merge entity {display_type} {nbt} {transformation}'
+        return '', f'{display_type} {nbt}'
 
+# 엔티티 하나의 명령 틀: 생성모드, 표시 타입, nbt마다 명령 앞부분과 대상을 한 번만 붙여 두고 프레임마다 값만 채운다
+# merge는 transformation 앞, head는 머리 아이템 앞까지
+CommandTemplate = namedtuple('CommandTemplate', ['merge', 'head'])
 
-# 부모 트랜스폼을 자식에게 적용하는 함수
-def process_transforms(parent_transforms, children, mode, default_interpolation_value, temporary_player_name, scoreboard_name, scoreboard_start_value):
-    results = []
-    for child in children:
-        nbt = child.get("nbt", "")
-        nbt = convert_uuid(nbt)  # UUID 변환 및 Tags 제거
-        texture_value = extract_texture_value(child)  # 텍스처 값 추출
-
-        if child.get('isItemDisplay'):
-            child_transforms = child['transforms']
-            final_transforms = apply_transforms(parent_transforms, child_transforms)
-            transformation = format_transformation(final_transforms, default_interpolation_value)
-            result_line = generate_output_line(mode, "isItemDisplay", transformation, nbt, texture_value, temporary_player_name, scoreboard_name, scoreboard_start_value)
-            if result_line:
-                results.append(result_line)
-
-        elif child.get('isBlockDisplay'):
-            child_transforms = child['transforms']
-            final_transforms = apply_transforms(parent_transforms, child_transforms)
-            transformation = format_transformation(final_transforms, default_interpolation_value)
-            result_line = generate_output_line(mode, "isBlockDisplay", transformation, nbt, texture_value, temporary_player_name, scoreboard_name, scoreboard_start_value)
-            if result_line:
-                results.append(result_line)
-
-        elif child.get('isTextDisplay'):
-            child_transforms = child['transforms']
-            final_transforms = apply_transforms(parent_transforms, child_transforms)
-            transformation = format_transformation(final_transforms, default_interpolation_value)
-            result_line = generate_output_line(mode, "isTextDisplay", transformation, nbt, texture_value, temporary_player_name, scoreboard_name, scoreboard_start_value)
-            if result_line:
-                results.append(result_line)
+@lru_cache(maxsize=NBT_CACHE_SIZE)
+def command_template(mode, display_type, nbt):
+    prefix, target = resolve_command_target(mode, display_type, nbt)
+    return CommandTemplate(f'{prefix}data merge entity {target} ', f'{prefix}item replace entity {target} container.0 with ')
 
-        elif child.get('isCollection'):
-            results.extend(process_transforms(apply_transforms(parent_transforms, child['transforms']), child.get('children', []), mode, default_interpolation_value, temporary_player_name, scoreboard_name, scoreboard_start_value))
+# 출력 라인을 생성하는 함수
+def generate_output_line(mode, display_type, transformation, nbt, texture_value=None):
+    if texture_value:
+        item_structure = f'item:{{id:player_head,components:{{"profile":{{properties:[{{name:textures,value:"{texture_value}"}}]}}}}}}'
+        transformation = transformation[:-1] + f', {item_structure}}}'
+    return command_template(mode, display_type, nbt).merge + transformation
+
+# 머리 텍스처만 바뀐 엔티티의 출력 라인을 생성하는 함수
+def generate_head_line(mode, display_type, nbt, texture_value):
+    return command_template(mode, display_type, nbt).head + f'player_head[profile={{properties:[{{name:"textures",value:"{texture_value}"}}]}}]'
 
+# 표시 엔티티 종류를 판별하는 함수
+def get_display_type(child):
+    for display_type in ("isItemDisplay", "isBlockDisplay", "isTextDisplay"):
+        if child.get(display_type):
+            return display_type
+    return None
+
+# isCollection 계층을 평탄화하는 함수
+# 노드는 부모가 항상 자식보다 앞에 오도록 깊이 우선 순서로 쌓인다
+def flatten_hierarchy(data):
+    local_transforms = []  # 노드별 로컬 transforms
+    parents = []           # 부모 노드 인덱스 (최상위는 -1)
+    levels = []            # 노드 깊이
+    entities = []          # (노드 인덱스, display_type, child)
+
+    def walk(children, parent, level):
+        for child in children:
+            display_type = get_display_type(child)
+            if display_type:
+                entities.append((len(local_transforms), display_type, child))
+                local_transforms.append(child['transforms'])
+                parents.append(parent)
+                levels.append(level)
+            elif child.get('isCollection'):
+                node = len(local_transforms)
+                local_transforms.append(child['transforms'])
+                parents.append(parent)
+                levels.append(level)
+                walk(child.get('children', []), node, level + 1)
+
+    for item in data:
+        if 'children' in item:
+            root = len(local_transforms)
+            local_transforms.append(item.get('transforms', [0] * 16))
+            parents.append(-1)
+            levels.append(0)
+            walk(item['children'], root, 1)
+
+    return local_transforms, parents, levels, entities
+
+# (N,4,4) 부모와 자식을 한 번에 곱하는 함수 (apply_transforms와 같은 순서로 더해 결과가 동일)
+def apply_transforms_batch(parent_transforms, child_transforms):
+    return (parent_transforms[:, :, 0, None] * child_transforms[:, None, 0, :] +
+            parent_transforms[:, :, 1, None] * child_transforms[:, None, 1, :] +
+            parent_transforms[:, :, 2, None] * child_transforms[:, None, 2, :] +
+            parent_transforms[:, :, 3, None] * child_transforms[:, None, 3, :])
+
+# 정수끼리만 곱하고 더한 성분을 표시하는 함수 (순수 파이썬에서는 이 성분이 int로 남아 "1f"처럼 출력됨)
+def apply_int_mask_batch(parent_mask, child_mask):
+    return ((parent_mask[:, :, 0, None] & child_mask[:, None, 0, :]) &
+            (parent_mask[:, :, 1, None] & child_mask[:, None, 1, :]) &
+            (parent_mask[:, :, 2, None] & child_mask[:, None, 2, :]) &
+            (parent_mask[:, :, 3, None] & child_mask[:, None, 3, :]))
+
+# 평탄화된 계층의 월드 transforms를 깊이별로 묶어 계산하는 함수 (numpy)
+def compose_world_transforms_numpy(local_transforms, parents, levels):
+    count = len(local_transforms)
+    local = np.array(local_transforms, dtype=np.float64).reshape(count, 4, 4)
+    int_mask = np.fromiter((type(t) is int for transforms in local_transforms for t in transforms),
+                           dtype=bool, count=count * 16).reshape(count, 4, 4)
+    parent_index = np.array(parents, dtype=np.intp)
+    level_index = np.array(levels, dtype=np.intp)
+
+    world = local.copy()
+    world_mask = int_mask.copy()
+    for level in range(1, int(level_index.max()) + 1):
+        nodes = np.nonzero(level_index == level)[0]
+        node_parents = parent_index[nodes]
+        world[nodes] = apply_transforms_batch(world[node_parents], local[nodes])
+        world_mask[nodes] = apply_int_mask_batch(world_mask[node_parents], int_mask[nodes])
+
+    results = world.reshape(count, 16).tolist()
+    for node, index in zip(*np.nonzero(world_mask.reshape(count, 16))):
+        results[node][index] = int(results[node][index])
     return results
 
-# 최상위 데이터를 처리하는 함수
-def handle_top_level_data(data, mode, default_interpolation_value, temporary_player_name, scoreboard_name, scoreboard_start_value):
+# 평탄화된 계층의 월드 transforms를 하나씩 계산하는 함수 (numpy가 없을 때)
+def compose_world_transforms_python(local_transforms, parents):
+    world = []
+    for transforms, parent in zip(local_transforms, parents):
+        if parent < 0:
+            world.append(transforms)
+        else:
+            world.append(apply_transforms(world[parent], transforms))
+    return world
+
+# 한 프레임의 모든 표시 엔티티에 대해 (child, display_type, 최종 transforms)를 구하는 함수
+def compose_entity_transforms(data):
+    local_transforms, parents, levels, entities = flatten_hierarchy(data)
+    if not entities:
+        return []
+    if np is not None:
+        world = compose_world_transforms_numpy(local_transforms, parents, levels)
+    else:
+        world = compose_world_transforms_python(local_transforms, parents)
+    return [(child, display_type, world[node]) for node, display_type, child in entities]
+
+# 머리 텍스처 표를 data storage에 두는 모드에서 쓰는 이름 (모두 네임스페이스 경로 아래)
+TEXTURE_STORAGE = 'textures'                 # data storage <네임스페이스>textures 의 list에 {value:"..."}로 저장
+TEXTURE_SETUP_FUNCTION = 'texture_setup'     # 텍스처 표를 한 번 채우는 함수
+HEAD_MACRO_FUNCTION = 'set_head'             # 표의 항목 하나로 @s의 머리를 바꾸는 매크로 함수
+
+# 텍스처 표의 번호로 머리를 바꾸는 명령을 생성하는 함수
+def generate_head_macro_line(mode, display_type, nbt, texture_index, namespace):
+    prefix, target = resolve_command_target(mode, display_type, nbt)
+    call = f'function {namespace}{HEAD_MACRO_FUNCTION} with storage {namespace}{TEXTURE_STORAGE} list[{texture_index}]'
+    if target == '@s':
+        return f'{prefix}{call}'
+    return f'{prefix}execute as {target} run {call}'
+
+# 텍스처 표를 채우는 함수와 매크로 함수의 라인을 만드는 함수
+def build_texture_functions(texture_ids, namespace):
+    storage = f'{namespace}{TEXTURE_STORAGE}'
+    setup_lines = [f'data modify storage {storage} list set value []']
+    setup_lines.extend(f'data modify storage {storage} list append value {{value:"{texture}"}}' for texture in texture_ids)
+    macro_lines = ['$item replace entity @s container.0 with player_head[profile={properties:[{name:"textures",value:"$(value)"}]}]']
+    return setup_lines, macro_lines
+
+# 프레임 명령을 data storage에 두고 매크로 함수로 재생하는 모드에서 쓰는 이름 (모두 네임스페이스 경로 아래)
+FRAME_STORAGE = 'frames'                     # data storage <네임스페이스>frames 의 list.s<스코어>에 [{cmd:'...'}]로 저장
+FRAME_SETUP_FUNCTION = 'frame_setup'         # 프레임 데이터를 한 번 채우는 함수
+FRAME_PLAYER_FUNCTION = 'play_frame'         # 스코어의 명령 목록을 꺼내는 매크로 함수
+FRAME_QUEUE_FUNCTION = 'play_commands'       # 꺼낸 명령 목록을 앞에서부터 하나씩 실행하는 함수
+FRAME_COMMAND_FUNCTION = 'run_command'       # 명령 하나를 실행하는 매크로 함수
+
+# 문자열을 SNBT 작은따옴표 문자열로 감싸는 함수
+def quote_snbt_string(text):
+    return "'" + text.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+# 스코어별 명령 목록 {스코어: 명령 라인 목록}으로 프레임 데이터를 채우는 함수, frame 파일, 재생 함수들의 라인을 만드는 함수
+# -> (채우는 함수 라인, frame 파일 라인, {재생 함수 이름: 라인 목록})
+def build_frame_storage_functions(score_commands, temporary_player_name, scoreboard_name, namespace):
+    storage = f'{namespace}{FRAME_STORAGE}'
+    setup_lines = [f'data modify storage {storage} list set value {{}}']
+    setup_lines.extend(f"data modify storage {storage} list.s{score} set value "
+                       f"[{','.join(f'{{cmd:{quote_snbt_string(command)}}}' for command in commands)}]"
+                       for score, commands in sorted(score_commands.items()) if commands)
+    frame_lines = [f'execute store result storage {storage} tick.score int 1 run scoreboard players get {temporary_player_name} {scoreboard_name}',
+                   f'function {namespace}{FRAME_PLAYER_FUNCTION} with storage {storage} tick']
+    player_functions = {
+        # 이번 스코어의 목록이 없으면 queue는 직전 재생에서 비워진 그대로 남는다
+        FRAME_PLAYER_FUNCTION: [f'$data modify storage {storage} queue set from storage {storage} list.s$(score)',
+                                f'function {namespace}{FRAME_QUEUE_FUNCTION}'],
+        FRAME_QUEUE_FUNCTION: [f'execute unless data storage {storage} queue[0] run return fail',
+                               f'function {namespace}{FRAME_COMMAND_FUNCTION} with storage {storage} queue[0]',
+                               f'data remove storage {storage} queue[0]',
+                               f'function {namespace}{FRAME_QUEUE_FUNCTION}'],
+        FRAME_COMMAND_FUNCTION: ['$$(cmd)'],
+    }
+    return setup_lines, frame_lines, player_functions
+
+# 엔티티 하나의 프레임별 상태
+# key는 프레임 사이에서 같은 엔티티를 찾는 선택자 키, matrix_str은 비교와 출력에 쓰는 transformation 문자열
+EntityState = namedtuple('EntityState', ['key', 'display_type', 'nbt', 'matrix', 'matrix_str', 'texture'])
+
+# 엔티티의 선택자 키를 만드는 함수 (Tags가 있으면 Tags와 타입, 없으면 nbt 자체로 구분)
+@lru_cache(maxsize=NBT_CACHE_SIZE)
+def make_selector_key(display_type, nbt):
+    tags_str = process_tags(nbt)
+    return (display_type, tags_str) if tags_str else (display_type, nbt)
+
+# nbt 처리 캐시를 비우는 함수 (감시 모드, 다른 프로그램, 일괄 변환 워커처럼 한 프로세스가 여러 번 변환해도 캐시가 쌓이지 않게)
+def clear_nbt_caches():
+    for cached in (convert_uuid, process_tags, resolve_command_target, command_template, make_selector_key):
+        cached.cache_clear()
+
+# 엔티티 하나의 상태를 만드는 함수 (matrix_table이 있으면 행렬을 양자화해 표에서 가져옴)
+def make_entity_state(child, display_type, final_transforms, matrix_table=None):
+    nbt = child.get("nbt", "")
+    nbt = convert_uuid(nbt)  # UUID 변환 및 Tags 제거
+    texture_value = extract_texture_value(child)  # 텍스처 값 추출
+    if matrix_table is None:
+        matrix, matrix_str = final_transforms, format_matrix(final_transforms)
+    else:
+        matrix, matrix_str = matrix_table.intern(final_transforms)
+    return EntityState(make_selector_key(display_type, nbt), display_type, nbt, matrix, matrix_str, texture_value)
+
+# 프레임 데이터를 엔티티별 상태로 줄이는 함수
+def build_entity_states(data, profiler=NULL_PROFILER, subtree_cache=None, matrix_table=None):
+    if subtree_cache is not None:
+        return build_entity_states_incremental(data, subtree_cache, profiler, matrix_table)
+    with profiler.stage('compose'):
+        composed = compose_entity_transforms(data)
+    with profiler.stage('entity_states'):
+        entity_states = [make_entity_state(child, display_type, final_transforms, matrix_table)
+                         for child, display_type, final_transforms in composed]
+    return entity_states
+
+# 노드 아래 전체(transforms, nbt, 텍스처)의 지문을 만드는 함수
+# 자식 지문을 묶어 다시 해시하므로 프레임당 한 번만 훑고, 노드마다 fingerprints[id(노드)]에 기록한다
+# (1과 1.0은 출력이 "1f"와 "1.0f"로 달라지므로 값의 타입도 지문에 넣는다)
+def subtree_fingerprint(node, fingerprints):
+    children = node.get('children')
+    child_fingerprints = tuple(subtree_fingerprint(child, fingerprints) for child in children) if children else ()
+    transforms = node.get('transforms', ())
+    fingerprint = hash((tuple(transforms), tuple(map(type, transforms)), get_display_type(node), node.get('nbt', ''),
+                        extract_texture_value(node), child_fingerprints))
+    fingerprints[id(node)] = fingerprint
+    return fingerprint
+
+# 두 월드 transforms가 값과 타입까지 같은지 확인하는 함수 (최상위 노드는 부모가 None)
+def same_transforms(a, b):
+    if a is None or b is None:
+        return a is b
+    return a == b and all(type(x) is type(y) for x, y in zip(a, b))
+
+# 바뀌지 않은 isCollection 하위 트리를 건너뛰며 엔티티별 상태를 만드는 함수
+# subtree_cache는 실행 내내 유지되는 {노드 경로: (지문, 부모 월드 transforms, 하위 트리의 엔티티 상태들)}로,
+# 하위 트리의 지문과 부모의 합성 행렬이 모두 같으면 합성하지 않고 이전 상태 객체를 그대로 쓴다
+# (같은 객체라서 diff_entity_states의 문자열 비교도 동일성 검사로 끝난다)
+def build_entity_states_incremental(data, subtree_cache, profiler=NULL_PROFILER, matrix_table=None):
+    with profiler.stage('fingerprint'):
+        fingerprints = {}
+        for item in data:
+            if 'children' in item:
+                subtree_fingerprint(item, fingerprints)
+
+    entity_states = []     # 엔티티 상태 (새로 합성할 자리는 None으로 두고 아래에서 채움)
+    local_transforms = []  # 새로 합성할 엔티티와 그 부모 컬렉션의 월드 transforms
+    parents = []
+    levels = []
+    pending = []           # (entity_states 위치, display_type, child, local_transforms 위치)
+    fresh_subtrees = []    # (경로, 지문, 부모 월드 transforms, entity_states 시작, 끝)
+
+    def walk(node, parent_world, path):
+        fingerprint = fingerprints[id(node)]
+        cached = subtree_cache.get(path)
+        if cached is not None and cached[0] == fingerprint and same_transforms(cached[1], parent_world):
+            entity_states.extend(cached[2])
+            return
+
+        if parent_world is None:
+            world = node.get('transforms', [0] * 16)
+        else:
+            world = apply_transforms(parent_world, node['transforms'])
+        start = len(entity_states)
+        world_node = None
+        for index, child in enumerate(node.get('children', [])):
+            display_type = get_display_type(child)
+            if display_type:
+                if world_node is None:
+                    world_node = len(local_transforms)
+                    local_transforms.append(world)
+                    parents.append(-1)
+                    levels.append(0)
+                pending.append((len(entity_states), display_type, child, len(local_transforms)))
+                local_transforms.append(child['transforms'])
+                parents.append(world_node)
+                levels.append(1)
+                entity_states.append(None)
+            elif child.get('isCollection'):
+                walk(child, world, path + (index,))
+        fresh_subtrees.append((path, fingerprint, parent_world, start, len(entity_states)))
+
+    for index, item in enumerate(data):
+        if 'children' in item:
+            walk(item, None, (index,))
+
+    with profiler.stage('compose'):
+        if not pending:
+            world = []
+        elif np is not None:
+            world = compose_world_transforms_numpy(local_transforms, parents, levels)
+        else:
+            world = compose_world_transforms_python(local_transforms, parents)
+    with profiler.stage('entity_states'):
+        for position, display_type, child, node in pending:
+            entity_states[position] = make_entity_state(child, display_type, world[node], matrix_table)
+        for path, fingerprint, parent_world, start, end in fresh_subtrees:
+            subtree_cache[path] = (fingerprint, parent_world, entity_states[start:end])
+    return entity_states
+
+# teleport_duration의 최대값 (틱)
+TELEPORT_DURATION_MAX = 59
+
+# 루트 모션에서 소환한 뒤 처음 재생하기 전에 한 번 실행하는 함수 (모델을 마지막 프레임의 루트로 옮겨 둔다)
+ROOT_START_FUNCTION = 'root_start'
+
+# 루트 모션 상태의 엔티티 타입과 키, 비교와 출력에 쓰는 정수 단위 (위치 0.0001블록, 회전 0.001도)
+ROOT_MOTION_TYPE = 'root'
+ROOT_MOTION_KEY = (ROOT_MOTION_TYPE, '')
+ROOT_POSITION_SCALE = 10000
+ROOT_YAW_SCALE = 1000
+
+# 한 프레임의 루트 모션을 떼어 내는 클래스 (루트 모션(선택))
+# 처음 본 최상위 컬렉션 transforms의 이동과 Y축 회전을 루트로 정하고, 모든 최상위 transforms를 루트 기준으로 바꾼다
+# 루트는 ROOT_MOTION_TYPE 엔티티 상태 하나로 다른 엔티티처럼 비교되며, matrix_str은 "x,y,z,yaw" 정수 문자열이다
+class RootMotion:
+    def __init__(self):
+        self.state = None
+        self.inverse = None
+
+    # 최상위 transforms를 루트 기준으로 바꾼 값 (합성 오차로 생긴 -0.0 같은 흔들림은 잘라 낸다)
+    def relative(self, transforms):
+        if self.inverse is None:
+            yaw = math.atan2(transforms[2], transforms[10])
+            c, s = math.cos(yaw), math.sin(yaw)
+            x, y, z = transforms[3], transforms[7], transforms[11]
+            self.inverse = [c, 0, -s, s * z - c * x, 0, 1, 0, -y, s, 0, c, -s * x - c * z, 0, 0, 0, 1]
+            root = [c, 0, s, x, 0, 1, 0, y, -s, 0, c, z, 0, 0, 0, 1]
+            # 디스플레이 엔티티는 yaw만큼 Y축으로 반대 방향 회전해 그려지므로 yaw는 -각도
+            root_str = (f"{round(x * ROOT_POSITION_SCALE)},{round(y * ROOT_POSITION_SCALE)},{round(z * ROOT_POSITION_SCALE)},"
+                        f"{round(-math.degrees(yaw) * ROOT_YAW_SCALE)}")
+            self.state = EntityState(ROOT_MOTION_KEY, ROOT_MOTION_TYPE, '', root, root_str, None)
+        return [round(v, 12) + 0.0 for v in apply_transforms(self.inverse, transforms)]
+
+# .bdengine 파일 내용을 디코딩해 엔티티별 상태를 만드는 함수
+# root_motion이면 루트 모션 상태를 맨 앞에 넣고 다른 엔티티는 루트 기준 transforms로 만든다
+def decode_frame_bytes(raw_data, profiler=NULL_PROFILER, subtree_cache=None, matrix_table=None, root_motion=False):
+    with profiler.stage('base64'):
+        decoded_data = base64.b64decode(raw_data)
+    with profiler.stage('gzip'):
+        decompressed_data = gzip.decompress(decoded_data)
+        text_data = decompressed_data.decode('utf-8')
+
+    with profiler.stage('json'):
+        try:
+            data = json.loads(text_data)
+        except json.JSONDecodeError:
+            return None
+
+    if not root_motion:
+        return build_entity_states(data, profiler, subtree_cache, matrix_table)
+    root = RootMotion()
+    for item in data:
+        if 'children' in item:
+            item['transforms'] = root.relative(item.get('transforms', [0] * 16))
+    entity_states = build_entity_states(data, profiler, subtree_cache, matrix_table)
+    return entity_states if root.state is None else [root.state] + entity_states
+
+# .bdengine 파일 하나를 디코딩해 엔티티별 상태를 만드는 함수 (병렬 모드에서는 워커 프로세스에서 실행)
+def decode_frame_file(bdengine_file, profiler=NULL_PROFILER, subtree_cache=None, matrix_table=None, root_motion=False):
+    with profiler.stage('read'):
+        with open(bdengine_file, 'rb') as f:
+            raw_data = f.read()
+    return decode_frame_bytes(raw_data, profiler, subtree_cache, matrix_table, root_motion)
+
+# 여러 .bdengine 파일을 프로세스 풀에서 나눠 디코딩하는 함수 (행렬 양자화 표는 작업마다 복사본을 쓴다)
+def decode_frame_files_parallel(bdengine_files, jobs, matrix_table=None, root_motion=False):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunksize = max(1, len(bdengine_files) // (jobs * 4))
+        decode = partial(decode_frame_file, matrix_table=matrix_table, root_motion=root_motion)
+        return dict(zip(bdengine_files, executor.map(decode, bdengine_files, chunksize=chunksize)))
+
+# 스트리밍 모드에서 한 번에 읽는 .bdengine 조각 크기와 출력 파일 버퍼 크기
+STREAM_CHUNK_SIZE = 1 << 16
+STREAM_WRITE_BUFFER = 1 << 16
+
+# base64 문자가 아닌 바이트 (b64decode처럼 줄바꿈 등은 버린다)
+BASE64_IGNORED = re.compile(rb'[^A-Za-z0-9+/=]')
+
+# JSON 공백
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# .bdengine 파일을 조각 단위로 base64 디코딩, gzip 해제, UTF-8 디코딩해 텍스트 조각을 돌려주는 함수
+def iter_frame_text(bdengine_file, chunk_size=STREAM_CHUNK_SIZE):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = b''
+    with open(bdengine_file, 'rb') as f:
+        while True:
+            raw_chunk = f.read(chunk_size)
+            # 4글자 단위로 끊어 디코딩하고 나머지는 다음 조각 앞에 붙인다
+            data = pending + BASE64_IGNORED.sub(b'', raw_chunk)
+            cut = len(data) - len(data) % 4 if raw_chunk else len(data)
+            pending = data[cut:]
+            compressed = base64.b64decode(data[:cut])
+            while compressed:
+                if decompressor.eof:  # gzip 멤버가 여러 개 이어진 경우
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                text = text_decoder.decode(decompressor.decompress(compressed))
+                compressed = decompressor.unused_data
+                if text:
+                    yield text
+            if not raw_chunk:
+                break
+    if not decompressor.eof:
+        raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+    yield text_decoder.decode(b'', final=True)
+
+# 텍스트 조각을 받아 JSON을 앞에서부터 읽는 클래스 (스트리밍 모드)
+# 버퍼에는 아직 읽지 않은 부분과 다음 조각만 남는다
+class JsonStreamReader:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    # 다음 조각을 버퍼에 붙임, 더 없으면 False
+    def fill(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    # 공백을 건너뛰고 다음 문자를 돌려줌 (끝이면 빈 문자열)
+    def peek(self):
+        while True:
+            self.position = JSON_WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    # 다음 문자가 expected인지 확인하고 넘김
+    def expect(self, expected):
+        if self.peek() != expected:
+            raise json.JSONDecodeError(f"Expecting '{expected}'", self.buffer, self.position)
+        self.position += 1
+
+    # 값 하나를 통째로 읽는 함수
+    def read_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # 숫자는 조각 경계에서 잘렸을 수 있으므로 버퍼 끝에서 끝난 값은 다음 조각을 붙여 다시 읽는다
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.position = end
+            return value
+
+    # 객체나 배열의 항목 뒤에서 ','면 False, 닫는 괄호면 True
+    def end_of_items(self, closing):
+        separator = self.peek()
+        if separator not in (',', closing):
+            raise json.JSONDecodeError(f"Expecting ',' delimiter", self.buffer, self.position)
+        self.position += 1
+        return separator == closing
+
+    # 객체의 키를 하나씩 돌려주는 함수 (값은 키를 받은 쪽에서 읽어야 한다)
+    def iter_object(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            if self.end_of_items('}'):
+                return
+
+    # 배열의 원소마다 한 번씩 돌려주는 함수 (원소는 받은 쪽에서 읽어야 한다)
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield
+            if self.end_of_items(']'):
+                return
+
+# 스트리밍 모드에서 노드의 월드 transforms를 구하는 함수 (최상위 노드는 자기 transforms)
+def stream_node_world(fields, parent_world):
+    if parent_world is None:
+        return fields.get('transforms', [0] * 16)
+    return apply_transforms(parent_world, fields['transforms'])
+
+# 이미 읽은 자식 노드들에서 (display_type, child, 최종 transforms)를 flatten_hierarchy와 같은 순서로 꺼내는 함수
+def iter_tree_entities(children, world):
+    for child in children:
+        display_type = get_display_type(child)
+        if display_type:
+            yield display_type, child, apply_transforms(world, child['transforms'])
+        elif child.get('isCollection'):
+            yield from iter_tree_entities(child.get('children', []), apply_transforms(world, child['transforms']))
+
+# 객체 하나를 읽으며 그 아래의 표시 엔티티를 (display_type, child, 최종 transforms)로 흘려보내는 함수
+# 컬렉션의 children 앞에 transforms가 이미 나왔으면 자식을 하나씩 바로 처리하고,
+# 아니면 그 children만 통째로 읽어 두었다가 객체 끝에서 처리한다 (끝나면 children을 뺀 필드를 돌려줌)
+# root_motion(RootMotion)을 주면 최상위 객체의 transforms를 루트 기준으로 바꾼다
+def stream_node(reader, parent_world, root_motion=None):
+    fields = {}
+    streamed = False
+    for key in reader.iter_object():
+        is_collection = parent_world is None or (get_display_type(fields) is None and fields.get('isCollection'))
+        if key == 'children' and is_collection and 'transforms' in fields and reader.peek() == '[':
+            world = stream_node_world(fields, parent_world)
+            if parent_world is None and root_motion is not None:
+                world = root_motion.relative(world)
+            for _ in reader.iter_array():
+                if reader.peek() != '{':
+                    reader.read_value()
+                    continue
+                child = yield from stream_node(reader, world)
+                display_type = get_display_type(child)
+                if display_type:
+                    yield display_type, child, apply_transforms(world, child['transforms'])
+            streamed = True
+        else:
+            fields[key] = reader.read_value()
+
+    if not streamed and 'children' in fields:
+        if parent_world is None or (get_display_type(fields) is None and fields.get('isCollection')):
+            world = stream_node_world(fields, parent_world)
+            if parent_world is None and root_motion is not None:
+                world = root_motion.relative(world)
+            yield from iter_tree_entities(fields['children'], world)
+    fields.pop('children', None)
+    return fields
+
+# .bdengine 파일 하나를 스트리밍으로 읽어 엔티티별 상태를 하나씩 돌려주는 함수
+# 파일 전체의 텍스트나 JSON 트리를 메모리에 두지 않는다
+# (root_motion이면 decode_frame_bytes처럼 루트 모션 상태를 맨 앞에 보낸다)
+def iter_frame_entity_states(bdengine_file, matrix_table=None, root_motion=False):
+    reader = JsonStreamReader(iter_frame_text(bdengine_file))
+    root = RootMotion() if root_motion else None
+    root_sent = not root_motion
+    for _ in reader.iter_array():
+        if reader.peek() != '{':
+            reader.read_value()
+            continue
+        for display_type, child, final_transforms in stream_node(reader, None, root):
+            if not root_sent:
+                yield root.state
+                root_sent = True
+            yield make_entity_state(child, display_type, final_transforms, matrix_table)
+    if not root_sent and root.state is not None:
+        yield root.state
+
+# 바뀐 엔티티 하나의 출력 내용 (interpolation이 있으면 프레임의 기본 보간값 대신 사용)
+EntityChange = namedtuple('EntityChange', ['state', 'is_transformation', 'is_head', 'interpolation'])
+
+# 직전 프레임과 비교해 바뀐 엔티티만 고르는 함수
+# previous_matrices는 직전 프레임의 엔티티별 matrix_str (첫 프레임이면 None),
+# head_values는 엔티티별로 마지막에 내보낸 텍스처 번호로 실행 내내 유지되고,
+# texture_ids는 처음 나온 순서대로 번호를 매긴 텍스처 표 (긴 텍스처 문자열 대신 번호로 비교)
+def diff_entity_states(previous_matrices, entity_states, head_values, texture_ids):
+    current_matrices = {}
+    changes = list(iter_entity_changes(previous_matrices, entity_states, head_values, texture_ids, current_matrices))
+    return current_matrices, changes
+
+# diff_entity_states와 같지만 바뀐 엔티티를 하나씩 돌려주고 이번 프레임의 상태는 current_matrices에 채우는 함수 (스트리밍 모드)
+def iter_entity_changes(previous_matrices, entity_states, head_values, texture_ids, current_matrices):
+    for state in entity_states:
+        key = state.key
+        in_previous = previous_matrices is not None and key in previous_matrices
+
+        is_transformation = not (in_previous and state.matrix_str == previous_matrices[key])
+        texture_id = texture_ids.setdefault(state.texture, len(texture_ids)) if state.texture else None
+        is_head = texture_id is not None and not (in_previous and texture_id == head_values.get(key))
+        current_matrices[key] = state.matrix_str
+
+        # 머리, trans 둘 다 안 바뀌면 추가 하지 않기
+        if not is_head and not is_transformation:
+            continue
+        if is_head:
+            head_values[key] = texture_id
+        yield EntityChange(state, is_transformation, is_head, None)
+
+# 바뀐 엔티티 하나의 출력 라인들을 만드는 함수
+# transformation은 포맷팅된 값 (None이면 머리만), texture_ids가 있으면 머리는 텍스처 표 매크로로 바꾼다
+def render_change_lines(mode, change, transformation, texture_ids=None, namespace=None):
+    state = change.state
+    lines = []
+    if transformation is not None:
+        inline_texture = state.texture if change.is_head and texture_ids is None else None
+        lines.append(generate_output_line(mode, state.display_type, transformation, state.nbt, inline_texture))
+    if change.is_head and (transformation is None or texture_ids is not None):
+        if texture_ids is None:
+            lines.append(generate_head_line(mode, state.display_type, state.nbt, state.texture))
+        else:
+            lines.append(generate_head_macro_line(mode, state.display_type, state.nbt, texture_ids[state.texture], namespace))
+    return lines
+
+# 바뀐 엔티티 하나의 출력 라인들을 만드는 함수 (행렬 출력)
+def render_entity_change(mode, change, default_interpolation_value, texture_ids=None, namespace=None):
+    transformation = None
+    if change.is_transformation:
+        transformation = format_transformation(change.state.matrix_str, change.interpolation or default_interpolation_value)
+    return render_change_lines(mode, change, transformation, texture_ids, namespace)
+
+# 모델 태그로 묶은 엔티티 함수 (frame_entities/f숫자)를 저장하는 하위 폴더
+FRAME_ENTITY_FOLDER = 'frame_entities'
+
+# 틱당 명령 예산을 넘어 나눈 프레임의 뒤쪽 조각 (frame_split/f숫자_k)을 저장하는 하위 폴더
+FRAME_SPLIT_FOLDER = 'frame_split'
+
+# 나눈 프레임 조각의 보간 시작을 delay틱 앞당기는 함수 (조각은 delay틱 늦게 실행되므로 원래 프레임과 같은 시각에 움직임이 끝남)
+def shift_start_interpolation(lines, delay):
+    if delay == 0:
+        return lines
+    return [line.replace('{start_interpolation: 0, ', f'{{start_interpolation: {-delay}, ', 1) for line in lines]
+
+# 모델 태그로 묶어 갱신할 엔티티인지 확인하는 함수 (태그로 찾는 엔티티만, UUID로 바로 찾는 엔티티는 제외)
+def is_tag_selected(state):
+    return state.display_type in DISPLAY_ENTITY_TYPES and bool(process_tags(state.nbt))
+
+# 엔티티 함수에서 엔티티마다 마지막 라인을 return run으로 바꾸는 함수 (맞는 엔티티를 찾으면 나머지 태그 검사를 건너뜀)
+# 라인은 생성모드 0 형식(execute if entity @s[tag=...,type=...] run ...)이고 한 엔티티의 라인은 붙어 있다
+def add_entity_returns(lines):
+    guards = [line[:line.index(' run ') + len(' run ')] for line in lines]
+    return [line if index + 1 < len(lines) and guards[index + 1] == guards[index]
+            else f"{guards[index]}return run {line[len(guards[index]):]}"
+            for index, line in enumerate(lines)]
+
+# 엔티티 함수 트리의 잎 노드 하나에서 직접 검사할 최대 엔티티 수
+ENTITY_TREE_LEAF_SIZE = 4
+
+# 엔티티 함수의 @s 검사 -> 엔티티 번호를 스코어로 넣는 함수 (엔티티 함수를 처음 실행하기 전에 한 번 실행)
+ENTITY_SETUP_FUNCTION = 'entity_setup'
+
+# 엔티티 함수 라인(add_entity_returns를 거친 라인)을 엔티티 번호 스코어의 범위 검사 트리로 만드는 함수
+# 엔티티마다 태그 검사를 차례로 하는 대신 @s의 스코어로 반씩 좁혀 가므로 엔티티 하나가 O(log n)개의 검사만 실행한다
+# entity_ids는 {@s 검사: 번호}이고 처음 보는 엔티티에 다음 번호를 붙인다
+# 엔티티 함수에 들어갈 라인과 {노드 이름: 라인 목록}을 반환 (노드는 folder 아래에 저장)
+def build_entity_tree(lines, entity_ids, scoreboard_name, namespace, folder):
+    entity_lines = {}  # 엔티티 번호 -> @s 검사를 번호 검사로 바꾼 라인
+    for line in lines:
+        guard = line[:line.index(' run ') + len(' run ')]
+        entity_id = entity_ids.setdefault(guard, len(entity_ids))
+        entity_lines.setdefault(entity_id, []).append(
+            f"execute if score @s {scoreboard_name} matches {entity_id} run {line[len(guard):]}")
+    ids = sorted(entity_lines)
+    nodes = {}
+
+    # 앞쪽 반은 노드로 보내고 뒤쪽 반은 그 자리에서 이어 나눈다
+    def build(low, high):
+        lines = []
+        while high - low > ENTITY_TREE_LEAF_SIZE:
+            middle = (low + high) // 2
+            node_name = f"{folder}/{ids[low]}_{ids[middle - 1]}"
+            nodes[node_name] = build(low, middle)
+            lines.append(f"execute if score @s {scoreboard_name} matches {ids[low]}..{ids[middle - 1]} "
+                         f"run return run function {namespace}{node_name}")
+            low = middle
+        return lines + [line for entity_id in ids[low:high] for line in entity_lines[entity_id]]
+
+    return build(0, len(ids)), nodes
+
+# 엔티티 번호를 넣는 함수의 라인 (같은 모델을 여럿 소환했으면 같은 엔티티끼리 같은 번호)
+def entity_setup_lines(entity_ids, scoreboard_name):
+    return [f"scoreboard players set @e[{guard[len('execute if entity @s['):-len('] run ')]}] {scoreboard_name} {entity_id}"
+            for guard, entity_id in entity_ids.items()]
+
+# transformation 성분 이름 (Minecraft의 translation, left_rotation, scale, right_rotation 순서)
+TRANSFORMATION_COMPONENTS = ('translation', 'left_rotation', 'scale', 'right_rotation')
+
+# 특이값이 모두 이 비율 안에서 같으면 균등 스케일로 보고 스케일 세 성분을 행렬식의 세제곱근으로 맞춘다
+# (출력은 소수 4자리이고, 내보낸 행렬의 반올림 오차만으로도 특이값이 1e-6 정도 벌어진다)
+UNIFORM_SCALE_EPSILON = 1e-4
+
+# 분해 결과가 행렬을 이 오차 안에서 재현하면 같은 분해로 본다 (출력 소수 4자리 기준, 양자화하면 양자화 단위로 늘림)
+DECOMPOSE_TOLERANCE = 1e-4
+
+# 쿼터니언 부호를 정할 때 이보다 작은 성분은 0으로 본다 (소수 4자리로 반올림하면 0이 되는 크기)
+QUATERNION_SIGN_EPSILON = 5e-5
+
+# 3x3 회전 행렬을 쿼터니언 [x, y, z, w]로 바꾸는 함수
+def rotation_to_quaternion(r):
+    trace = r[0][0] + r[1][1] + r[2][2]
+    if trace > 0:
+        s = math.sqrt(trace + 1.0) * 2
+        q = [(r[2][1] - r[1][2]) / s, (r[0][2] - r[2][0]) / s, (r[1][0] - r[0][1]) / s, 0.25 * s]
+    elif r[0][0] > r[1][1] and r[0][0] > r[2][2]:
+        s = math.sqrt(1.0 + r[0][0] - r[1][1] - r[2][2]) * 2
+        q = [0.25 * s, (r[0][1] + r[1][0]) / s, (r[0][2] + r[2][0]) / s, (r[2][1] - r[1][2]) / s]
+    elif r[1][1] > r[2][2]:
+        s = math.sqrt(1.0 + r[1][1] - r[0][0] - r[2][2]) * 2
+        q = [(r[0][1] + r[1][0]) / s, 0.25 * s, (r[1][2] + r[2][1]) / s, (r[0][2] - r[2][0]) / s]
+    else:
+        s = math.sqrt(1.0 + r[2][2] - r[0][0] - r[1][1]) * 2
+        q = [(r[0][2] + r[2][0]) / s, (r[1][2] + r[2][1]) / s, 0.25 * s, (r[1][0] - r[0][1]) / s]
+    # q와 -q는 같은 회전이므로 w (w가 출력에서 0이면 x, y, z 순서로 처음 0이 아닌 성분)가 양수인 쪽을 사용
+    for v in (q[3], q[0], q[1], q[2]):
+        if abs(v) >= QUATERNION_SIGN_EPSILON:
+            return [-x for x in q] if v < 0 else q
+    return q
+
+# (N,3,3) 회전 행렬을 (N,4) 쿼터니언으로 바꾸는 함수 (numpy, rotation_to_quaternion과 같은 순서로 계산해 결과가 같음)
+def rotation_to_quaternion_batch(r):
+    trace = r[:, 0, 0] + r[:, 1, 1] + r[:, 2, 2]
+    cases = [trace > 0,
+             (r[:, 0, 0] > r[:, 1, 1]) & (r[:, 0, 0] > r[:, 2, 2]),
+             r[:, 1, 1] > r[:, 2, 2]]
+    diagonal = [trace + 1.0, 1.0 + r[:, 0, 0] - r[:, 1, 1] - r[:, 2, 2], 1.0 + r[:, 1, 1] - r[:, 0, 0] - r[:, 2, 2]]
+    s = np.sqrt(np.maximum(np.select(cases, diagonal, 1.0 + r[:, 2, 2] - r[:, 0, 0] - r[:, 1, 1]), 1e-12)) * 2
+    wx, wy, wz = r[:, 2, 1] - r[:, 1, 2], r[:, 0, 2] - r[:, 2, 0], r[:, 1, 0] - r[:, 0, 1]
+    xy, xz, yz = r[:, 0, 1] + r[:, 1, 0], r[:, 0, 2] + r[:, 2, 0], r[:, 1, 2] + r[:, 2, 1]
+    quarter = 0.25 * s
+    q = np.stack([np.select(cases, [wx / s, quarter, xy / s], xz / s),
+                  np.select(cases, [wy / s, xy / s, quarter], yz / s),
+                  np.select(cases, [wz / s, xz / s, yz / s], quarter),
+                  np.select(cases, [quarter, wx / s, wy / s], wz / s)], axis=1)
+    signs = np.zeros(len(q))
+    for index in (3, 0, 1, 2):
+        signs = np.where((signs == 0) & (np.abs(q[:, index]) >= QUATERNION_SIGN_EPSILON), np.sign(q[:, index]), signs)
+    return np.where(signs[:, None] < 0, -q, q)
+
+# 3x3 행렬의 특이값 분해 a = u * diag(sigma) * v^T 를 구하는 함수 (numpy가 없을 때, a^T a의 야코비 고유값 분해)
+def svd3(a):
+    b = [[sum(a[k][i] * a[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+    v = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+    for _ in range(32):
+        off_diagonal = abs(b[0][1]) + abs(b[0][2]) + abs(b[1][2])
+        if off_diagonal < 1e-24:
+            break
+        for p, q in ((0, 1), (0, 2), (1, 2)):
+            if abs(b[p][q]) < 1e-30:
+                continue
+            theta = (b[q][q] - b[p][p]) / (2 * b[p][q])
+            t = (1.0 if theta >= 0 else -1.0) / (abs(theta) + math.sqrt(theta * theta + 1))
+            c = 1 / math.sqrt(t * t + 1)
+            s = t * c
+            for k in range(3):  # b = b * J
+                bkp, bkq = b[k][p], b[k][q]
+                b[k][p], b[k][q] = c * bkp - s * bkq, s * bkp + c * bkq
+            for k in range(3):  # b = J^T * b
+                bpk, bqk = b[p][k], b[q][k]
+                b[p][k], b[q][k] = c * bpk - s * bqk, s * bpk + c * bqk
+            for k in range(3):  # v = v * J
+                vkp, vkq = v[k][p], v[k][q]
+                v[k][p], v[k][q] = c * vkp - s * vkq, s * vkp + c * vkq
+
+    order = sorted(range(3), key=lambda i: -b[i][i])
+    sigma = [math.sqrt(max(b[i][i], 0.0)) for i in order]
+    v = [[v[row][i] for i in order] for row in range(3)]
+
+    u, sigma = left_singular_vectors(a, v, sigma)
+    return u, sigma, v
+
+# 이보다 작은 특이값(가장 큰 특이값에 대한 비율)은 a^T a의 반올림 오차에 묻히므로 0으로 본다
+SVD_RANK_EPSILON = 1e-6
+
+# a = u * diag(sigma) * v^T 의 u와 sigma를 v에서 구하는 함수
+# u의 앞 두 열은 a * v_i를 그람-슈미트로 직교화하고 (특이값이 0이면 직교하는 임의의 축), 셋째 열은 두 열의 외적으로 두어
+# u는 항상 회전이다. 뒤집힘은 셋째 특이값의 부호로 나타난다
+def left_singular_vectors(a, v, sigma):
+    limit = SVD_RANK_EPSILON * abs(sigma[0])
+    images = [[sum(a[row][k] * v[k][i] for k in range(3)) for row in range(3)] for i in range(3)]
+    columns = []
+    values = []
+    for i in range(2):
+        w = images[i]
+        for column in columns:
+            dot = sum(w[k] * column[k] for k in range(3))
+            w = [w[k] - dot * column[k] for k in range(3)]
+        norm = math.sqrt(sum(x * x for x in w))
+        if abs(sigma[i]) > limit and norm > limit:
+            columns.append([x / norm for x in w])
+            values.append(norm)
+            continue
+        # 자기 자신과 가장 덜 겹치는 축으로 임의의 직교 벡터를 만듦
+        base = columns[0] if columns else [1.0, 0.0, 0.0]
+        axis = min(range(3), key=lambda k: abs(base[k]))
+        candidate = [1.0 if k == axis else 0.0 for k in range(3)]
+        if columns:
+            dot = sum(candidate[k] * base[k] for k in range(3))
+            candidate = [candidate[k] - dot * base[k] for k in range(3)]
+        norm = math.sqrt(sum(x * x for x in candidate))
+        columns.append([x / norm for x in candidate])
+        values.append(0.0)
+    c0, c1 = columns
+    columns.append([c0[1] * c1[2] - c0[2] * c1[1], c0[2] * c1[0] - c0[0] * c1[2], c0[0] * c1[1] - c0[1] * c1[0]])
+    values.append(sum(columns[2][k] * images[2][k] for k in range(3)) if abs(sigma[2]) > limit else 0.0)
+    u = [[columns[i][row] for i in range(3)] for row in range(3)]
+    return u, values
+
+# 3x3 행렬식
+def determinant3(m):
+    return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1]) -
+            m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0]) +
+            m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+# 행렬을 a = R * diag(S) (right_rotation이 단위 회전인 형태)로 나타내는 함수
+# 열을 x, y, z 순서로 직교화해 R을 만들고 뒤집힘은 마지막 스케일의 부호로 표현, 재현 오차가 tolerance를 넘으면 None
+def decompose_axis_scale(a, tolerance):
+    x = [a[0][0], a[1][0], a[2][0]]
+    y = [a[0][1], a[1][1], a[2][1]]
+    z = [a[0][2], a[1][2], a[2][2]]
+    sx = math.sqrt(x[0] * x[0] + x[1] * x[1] + x[2] * x[2])
+    if sx < 1e-12:
+        return None
+    rx = [x[0] / sx, x[1] / sx, x[2] / sx]
+    dot = rx[0] * y[0] + rx[1] * y[1] + rx[2] * y[2]
+    w = [y[0] - dot * rx[0], y[1] - dot * rx[1], y[2] - dot * rx[2]]
+    sy = math.sqrt(w[0] * w[0] + w[1] * w[1] + w[2] * w[2])
+    if sy < 1e-12:
+        return None
+    ry = [w[0] / sy, w[1] / sy, w[2] / sy]
+    rz = [rx[1] * ry[2] - rx[2] * ry[1], rx[2] * ry[0] - rx[0] * ry[2], rx[0] * ry[1] - rx[1] * ry[0]]
+    sz = rz[0] * z[0] + rz[1] * z[1] + rz[2] * z[2]
+    rotation = [[rx[row], ry[row], rz[row]] for row in range(3)]
+    sigma = [sx, sy, sz]
+    error = max(abs(rotation[row][col] * sigma[col] - a[row][col]) for row in range(3) for col in range(3))
+    if error > tolerance * max(sx, sy, abs(sz), 1.0):
+        return None
+    if max(sigma) - min(sigma) <= tolerance * max(sx, 1.0):
+        # 균등 스케일이면 세 성분이 같도록 행렬식의 세제곱근으로 둠
+        sigma = [determinant3(a) ** (1.0 / 3)] * 3
+    return rotation, sigma
+
+# 특이값 분해 결과를 프레임 사이에서 흔들리지 않는 한 가지 형태로 맞추는 함수
+# 특이값이 tolerance 안에서 겹치는 두 축은 그 평면 안의 어떤 직교 쌍이든 답이므로, 평면에 가장 많이 들어가는
+# 좌표축의 사영을 첫 축으로 정한다. v의 각 열은 절댓값이 가장 큰 성분이 양수, u와 v는 회전(행렬식 +1),
+# 뒤집힘은 마지막 스케일의 부호로 표현 (u와 sigma는 정한 v에서 다시 구한다)
+def canonicalize_svd(a, u, sigma, v, tolerance):
+    magnitudes = [abs(value) for value in sigma]
+    for i, j, k in ((0, 1, 2), (1, 2, 0)):
+        if (abs(magnitudes[i] - magnitudes[j]) > tolerance * max(magnitudes[0], 1.0)
+                or magnitudes[j] <= SVD_RANK_EPSILON * magnitudes[0]):
+            continue
+        axis = max(range(3), key=lambda row: v[row][i] * v[row][i] + v[row][j] * v[row][j])
+        first = [v[axis][i] * v[row][i] + v[axis][j] * v[row][j] for row in range(3)]
+        norm = math.sqrt(first[0] * first[0] + first[1] * first[1] + first[2] * first[2])
+        first = [x / norm for x in first]
+        # (i, j, k)는 순환 순서이므로 v_j = v_k x v_i 로 두면 v의 행렬식 부호가 유지된다
+        third = [v[row][k] for row in range(3)]
+        orientation = 1.0 if determinant3(v) >= 0 else -1.0
+        second = [orientation * (third[1] * first[2] - third[2] * first[1]),
+                  orientation * (third[2] * first[0] - third[0] * first[2]),
+                  orientation * (third[0] * first[1] - third[1] * first[0])]
+        for index, column in ((i, first), (j, second)):
+            for row in range(3):
+                v[row][index] = column[row]
+    for i in range(3):
+        column = [v[row][i] for row in range(3)]
+        if max(column, key=abs) < 0:
+            for row in range(3):
+                v[row][i] = -v[row][i]
+    if determinant3(v) < 0:
+        for row in range(3):
+            v[row][2] = -v[row][2]
+    u, sigma = left_singular_vectors(a, v, magnitudes)
+    return u, sigma, v
+
+# 행렬 하나를 (translation, left_rotation, scale, right_rotation)으로 분해하는 함수 (numpy가 없을 때)
+# 회전과 축별 스케일로 나타낼 수 있으면 right_rotation은 단위 회전, 기울어진(전단) 행렬만 특이값 분해를 쓴다
+def decompose_transform_python(transforms, tolerance=DECOMPOSE_TOLERANCE):
+    a = [[transforms[row * 4 + col] for col in range(3)] for row in range(3)]
+    translation = [transforms[3], transforms[7], transforms[11]]
+    axis_scale = decompose_axis_scale(a, tolerance)
+    if axis_scale is not None:
+        rotation, sigma = axis_scale
+        return translation, rotation_to_quaternion(rotation), sigma, [0.0, 0.0, 0.0, 1.0]
+    u, sigma, v = canonicalize_svd(a, *svd3(a), tolerance)
+    if abs(sigma[0]) < 1e-12:
+        # 스케일이 0이면 회전은 의미가 없으므로 단위 회전
+        return translation, [0.0, 0.0, 0.0, 1.0], sigma, [0.0, 0.0, 0.0, 1.0]
+    right = [[v[col][row] for col in range(3)] for row in range(3)]
+    return translation, rotation_to_quaternion(u), sigma, rotation_to_quaternion(right)
+
+# 여러 행렬을 한 번에 분해하는 함수 (numpy)
+# decompose_axis_scale을 같은 순서의 원소별 연산으로 계산해 순수 파이썬과 같은 값을 얻고, 나머지는 순수 파이썬으로 분해
+def decompose_transforms_numpy(matrices, tolerance=DECOMPOSE_TOLERANCE):
+    m = np.array(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    x, y, z = m[:, :3, 0], m[:, :3, 1], m[:, :3, 2]
+    sx = np.sqrt(x[:, 0] * x[:, 0] + x[:, 1] * x[:, 1] + x[:, 2] * x[:, 2])
+    valid = sx >= 1e-12
+    rx = x / np.where(valid, sx, 1.0)[:, None]
+    dot = rx[:, 0] * y[:, 0] + rx[:, 1] * y[:, 1] + rx[:, 2] * y[:, 2]
+    w = y - dot[:, None] * rx
+    sy = np.sqrt(w[:, 0] * w[:, 0] + w[:, 1] * w[:, 1] + w[:, 2] * w[:, 2])
+    valid &= sy >= 1e-12
+    ry = w / np.where(valid, sy, 1.0)[:, None]
+    rz = np.stack([rx[:, 1] * ry[:, 2] - rx[:, 2] * ry[:, 1],
+                   rx[:, 2] * ry[:, 0] - rx[:, 0] * ry[:, 2],
+                   rx[:, 0] * ry[:, 1] - rx[:, 1] * ry[:, 0]], axis=1)
+    sz = rz[:, 0] * z[:, 0] + rz[:, 1] * z[:, 1] + rz[:, 2] * z[:, 2]
+    rotation = np.stack([rx, ry, rz], axis=2)
+    sigma = np.stack([sx, sy, sz], axis=1)
+    error = np.abs(rotation * sigma[:, None, :] - m[:, :3, :3]).max(axis=(1, 2))
+    valid &= error <= tolerance * np.maximum(np.maximum(np.maximum(sx, sy), np.abs(sz)), 1.0)
+    uniform = valid & ((sigma.max(axis=1) - sigma.min(axis=1)) <= tolerance * np.maximum(sx, 1.0))
+    if uniform.any():
+        # determinant3를 원소별로 계산해 순수 파이썬과 같은 값을 얻음
+        determinant = determinant3(m[uniform, :3, :3].transpose(1, 2, 0))
+        sigma[uniform] = (determinant ** (1.0 / 3))[:, None]
+
+    translation = m[:, :3, 3].tolist()
+    left = iter(rotation_to_quaternion_batch(rotation[valid]).tolist())
+    scale = iter(sigma[valid].tolist())
+    return [(translation[index], next(left), next(scale), [0.0, 0.0, 0.0, 1.0]) if is_valid
+            else decompose_transform_python(matrices[index], tolerance)
+            for index, is_valid in enumerate(valid.tolist())]
+
+# 성분 값을 문자열로 만드는 함수 (-0.0은 0.0으로)
+def format_component(values):
+    return ",".join(f"{round(v, 4) + 0.0}f" for v in values)
+
+# 여러 행렬을 분해해 성분별 문자열 ("translation:[...]" 등) 튜플로 만드는 함수
+# (numpy가 있든 없든 같은 문자열이 나온다)
+def decompose_transforms(matrices, tolerance=DECOMPOSE_TOLERANCE):
+    if not matrices:
+        return []
+    if np is not None:
+        decomposed = decompose_transforms_numpy(matrices, tolerance)
+    else:
+        decomposed = [decompose_transform_python(transforms, tolerance) for transforms in matrices]
+    return [tuple(f"{name}:[{format_component(values)}]" for name, values in zip(TRANSFORMATION_COMPONENTS, components))
+            for components in decomposed]
+
+# 분해 출력 모드에서 한 프레임의 출력 라인을 만드는 함수
+# emitted_components는 엔티티별로 마지막에 보낸 성분이고, 직전 프레임에 있던 엔티티는 바뀐 성분만 보낸다
+def render_decomposed_changes(mode, changes, default_interpolation_value, previous_keys, emitted_components, texture_ids=None, namespace=None,
+                              tolerance=DECOMPOSE_TOLERANCE):
+    transform_changes = [change for change in changes if change.is_transformation]
+    decomposed = dict(zip((id(change) for change in transform_changes),
+                          decompose_transforms([change.state.matrix for change in transform_changes], tolerance)))
     results = []
-    nbt = data.get("nbt", "")
-    final_transforms = data.get('transforms', [0] * 16)
+    for change in changes:
+        transformation = None
+        if change.is_transformation:
+            key = change.state.key
+            components = decomposed[id(change)]
+            previous = emitted_components.get(key) if key in previous_keys else None
+            emitted_components[key] = components
+            changed = [c for i, c in enumerate(components) if previous is None or previous[i] != c]
+            if changed:
+                transformation = format_transformation_components(",".join(changed), change.interpolation or default_interpolation_value)
+        results.extend(render_change_lines(mode, change, transformation, texture_ids, namespace))
+    return results
 
-    if 'children' in data:
-        results.extend(process_transforms(final_transforms, data['children'], mode, default_interpolation_value, temporary_player_name, scoreboard_name, scoreboard_start_value))
+# 출력할 프레임 하나 (score는 프레임이 실행되는 스코어, interpolation은 프레임의 기본 보간값)
+FrameOutput = namedtuple('FrameOutput', ['path', 'interpolation', 'score', 'entity_states', 'changes'])
+
+# 한 구간으로 합칠 수 있는 최대 프레임 수 (검사 비용 제한)
+DECIMATION_MAX_RUN = 64
+
+# 시작과 끝 행렬의 선형 보간이 목표 행렬을 허용 오차 안에서 재현하는지 확인하는 함수
+def fits_linear_interpolation(start, end, target, ratio, tolerance):
+    for i in range(12):  # 마지막 행은 항상 0,0,0,1
+        if abs(start[i] + (end[i] - start[i]) * ratio - target[i]) > tolerance:
+            return False
+    return True
+
+# 디스플레이 보간으로 재현되는 구간의 중간 키프레임을 지우는 함수
+# a 프레임의 자세 P_a에서 b 프레임의 자세 P_b까지 사이 프레임이 직선 위에 있으면,
+# a+1 프레임에서 P_b를 보간 시간 (b 도착 시각 - a+1 시각)으로 한 번만 보내고 a+2~b의 transformation은 생략한다
+def decimate_keyframes(frames, tolerance):
+    times = [frame.score for frame in frames]
+    durations = [int(frame.interpolation) for frame in frames]
+    states_by_frame = [{state.key: state for state in frame.entity_states} for frame in frames]
+    changes_by_frame = [{change.state.key: index for index, change in enumerate(frame.changes)} for frame in frames]
+    removed = 0
+
+    keys = {key for states in states_by_frame for key in states} - {ROOT_MOTION_KEY}  # 루트 모션은 상대 tp라서 합치지 않음
+    for key in keys:
+        a = 0
+        while a < len(frames) - 2:
+            start_state = states_by_frame[a].get(key)
+            first_index = changes_by_frame[a + 1].get(key)
+            # a+1 프레임 명령 시점에 P_a에 도착해 있고, a+1에서 실제로 transformation이 바뀌어야 함
+            if (start_state is None or first_index is None or not frames[a + 1].changes[first_index].is_transformation
+                    or durations[a] > times[a + 1] - times[a]):
+                a += 1
+                continue
+
+            best = None
+            for b in range(a + 2, min(len(frames), a + DECIMATION_MAX_RUN)):
+                end_state = states_by_frame[b].get(key)
+                duration = times[b] + durations[b] - times[a + 1]
+                if end_state is None or duration <= 0:
+                    break
+                if not all(k_state is not None and fits_linear_interpolation(
+                               start_state.matrix, end_state.matrix, k_state.matrix,
+                               (times[k] + durations[k] - times[a + 1]) / duration, tolerance)
+                           for k, k_state in ((k, states_by_frame[k].get(key)) for k in range(a + 1, b))):
+                    break
+                best = (b, end_state, duration)
+
+            if best is None:
+                a += 1
+                continue
+
+            b, end_state, duration = best
+            first_change = frames[a + 1].changes[first_index]
+            frames[a + 1].changes[first_index] = first_change._replace(
+                state=first_change.state._replace(matrix=end_state.matrix, matrix_str=end_state.matrix_str),
+                interpolation=str(duration))
+            for k in range(a + 2, b + 1):
+                index = changes_by_frame[k].get(key)
+                if index is None or not frames[k].changes[index].is_transformation:
+                    continue
+                removed += 1
+                if frames[k].changes[index].is_head:
+                    frames[k].changes[index] = frames[k].changes[index]._replace(is_transformation=False)
+                else:
+                    frames[k].changes[index] = None
+            a = b
 
-    return results
+    for frame in frames:
+        frame.changes[:] = [change for change in frame.changes if change is not None]
+    return removed
+
+# 빌드 캐시 형식 버전 (EntityState나 출력 형식이 바뀌면 올린다)
+BUILD_CACHE_VERSION = 1
+
+# 빌드 캐시를 읽는 함수 (cache가 있으면 파일 대신 메모리에 있는 캐시를 이어서 사용)
+# frames는 .bdengine 내용 해시별 엔티티 상태, outputs는 출력 파일별 내용 해시
+def load_build_cache(cache_path, settings_key, cache=None):
+    if cache is None and cache_path:
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+            cache = None
+
+    if not isinstance(cache, dict) or cache.get('version') != BUILD_CACHE_VERSION:
+        cache = {'version': BUILD_CACHE_VERSION, 'settings': settings_key, 'frames': {}, 'outputs': {}}
+
+    # 설정이 바뀌었으면 출력은 모두 다시 쓴다 (디코딩한 엔티티 상태는 설정과 무관하므로 유지)
+    if cache['settings'] != settings_key:
+        cache['settings'] = settings_key
+        cache['outputs'] = {}
+    return cache
+
+# 빌드 캐시를 저장하는 함수 (임시 파일에 쓴 뒤 교체)
+def save_build_cache(cache_path, cache):
+    temp_path = cache_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, cache_path)
+
+# 캐시를 거쳐 프레임별 엔티티 상태를 불러오는 함수 (내용이 바뀐 파일만 디코딩)
+# file_signatures가 있으면 {파일: ((수정 시각, 크기), 내용 해시)}로 그대로인 파일은 다시 읽지 않는다 (감시 모드)
+# 행렬을 양자화하거나 루트 모션을 떼면 다르게 만든 상태를 섞어 쓰지 않도록 캐시 키에 그 설정을 붙인다
+def load_cached_frame_states(bdengine_files, cache, jobs, profiler=NULL_PROFILER, file_signatures=None, matrix_table=None,
+                             root_motion=False):
+    frame_hashes = {}
+    with profiler.stage('hash'):
+        for bdengine_file in bdengine_files:
+            if file_signatures is not None:
+                stat = os.stat(bdengine_file)
+                signature = (stat.st_mtime_ns, stat.st_size)
+                known = file_signatures.get(bdengine_file)
+                if known is not None and known[0] == signature:
+                    frame_hashes[bdengine_file] = known[1]
+                    continue
+            with open(bdengine_file, 'rb') as f:
+                frame_hashes[bdengine_file] = hashlib.sha1(f.read()).hexdigest()
+            if file_signatures is not None:
+                file_signatures[bdengine_file] = (signature, frame_hashes[bdengine_file])
+        if matrix_table is not None or root_motion:
+            decode_key = (matrix_table.step if matrix_table is not None else None, root_motion)
+            frame_hashes = {f: (frame_hash,) + decode_key for f, frame_hash in frame_hashes.items()}
+
+    cached_frames = cache['frames']
+    changed_files = [f for f in bdengine_files if frame_hashes[f] not in cached_frames]
+    if jobs > 1 and len(changed_files) > 1:
+        with profiler.stage('decode_pool'):
+            decoded = decode_frame_files_parallel(changed_files, jobs, matrix_table, root_motion)
+    else:
+        subtree_cache = {}
+        decoded = {f: decode_frame_file(f, profiler, subtree_cache, matrix_table, root_motion) for f in changed_files}
+    for bdengine_file, entity_states in decoded.items():
+        cached_frames[frame_hashes[bdengine_file]] = entity_states
+
+    # 지금 애니메이션에 없는 프레임은 캐시에서 제거
+    cache['frames'] = {frame_hashes[f]: cached_frames[frame_hashes[f]] for f in bdengine_files}
+    print(f"빌드 캐시: 프레임 {len(bdengine_files)}개 중 {len(changed_files)}개 디코딩")
+    return {f: cache['frames'][frame_hashes[f]] for f in bdengine_files}
+
+# 컴파일한 프레임 파일 (--compiled)
+# 디코딩과 합성을 끝낸 프레임들을 한 파일에 모아 두고 mmap으로 필요한 프레임만 읽는다
+# [헤더 8바이트][프레임 블록 ...][JSON 색인][색인 위치 8바이트]
+# 프레임 블록: 엔티티마다 행렬 16개(float64), 엔티티 번호(uint32), 정수 성분 비트(uint16), transformation 문자열 끝 위치(uint32)를
+#   열 단위로 이어 붙이고 그 뒤에 transformation 문자열들을 붙임 (uint32 열은 4바이트, 블록은 8바이트 경계에 맞춤)
+# 색인: 엔티티 표 [표시 타입, nbt, 텍스처], 프레임별 [블록 위치, 엔티티 수], 원본 파일별 (수정 시각, 크기), 디코딩 설정
+# (출력 문자열과 정확히 같도록 행렬은 float64로, 문자열도 디코딩할 때 만든 그대로 둔다)
+COMPILED_FRAMES_MAGIC = b'BDFRAME1'
+COMPILED_FRAMES_VERSION = 1
+COMPILED_MATRIX_BYTES = 16 * 8
+
+# 컴파일한 프레임 파일을 mmap으로 열어 프레임마다 엔티티 상태를 만드는 클래스
+# 같은 엔티티의 행렬이 직전에 읽은 값과 같으면 그때 만든 (행렬, 문자열)을 그대로 쓴다
+class CompiledFrames:
+    def __init__(self, compiled_path):
+        self.file = open(compiled_path, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 빈 파일
+            self.file.close()
+            raise
+        try:
+            if self.buffer[:len(COMPILED_FRAMES_MAGIC)] != COMPILED_FRAMES_MAGIC:
+                raise ValueError("컴파일한 프레임 파일이 아닙니다.")
+            index_offset = int.from_bytes(self.buffer[-8:], 'little')
+            self.index = json.loads(self.buffer[index_offset:-8].decode('utf-8'))
+            self.entities = [(make_selector_key(display_type, nbt), display_type, nbt, texture)
+                             for display_type, nbt, texture in self.index['entities']]
+        except (ValueError, UnicodeDecodeError, KeyError, TypeError):
+            self.close()
+            raise ValueError("컴파일한 프레임 파일을 읽지 못했습니다.")
+        self.last_rows = {}  # 엔티티 번호 -> (행렬 바이트, 정수 성분 비트, 행렬, 문자열)
+
+    # 이 파일을 그대로 쓸 수 있는 원본 파일 목록인지 확인하는 함수 (디코딩 설정이 다르면 모든 프레임을 다시 컴파일)
+    def matches(self, decode_key):
+        return (self.index.get('version') == COMPILED_FRAMES_VERSION and self.index.get('byteorder') == sys.byteorder
+                and self.index.get('decode') == list(decode_key))
+
+    # 원본 파일의 (수정 시각, 크기)가 컴파일할 때와 같은 프레임인지 확인하는 함수
+    def is_current(self, bdengine_file, signature):
+        return self.index['sources'].get(bdengine_file) == list(signature) and bdengine_file in self.index['frames']
+
+    # 프레임 하나의 엔티티 상태 목록 (JSON이 잘못된 프레임이면 None)
+    def states(self, bdengine_file):
+        offset, count = self.index['frames'][bdengine_file]
+        if count is None:
+            return None
+        matrix_end = offset + count * COMPILED_MATRIX_BYTES
+        rows_end = matrix_end + count * 4
+        masks_end = rows_end + count * 2
+        ends_offset = masks_end + (-masks_end % 4)
+        text_offset = ends_offset + count * 4
+        states = []
+        with memoryview(self.buffer) as view, view[offset:matrix_end] as matrix_block, view[matrix_end:rows_end].cast('I') as rows, \
+                view[rows_end:masks_end].cast('H') as masks, view[ends_offset:text_offset].cast('I') as ends:
+            start = text_offset
+            for position in range(count):
+                row, mask, end = rows[position], masks[position], text_offset + ends[position]
+                matrix_bytes = matrix_block[position * COMPILED_MATRIX_BYTES:(position + 1) * COMPILED_MATRIX_BYTES]
+                last = self.last_rows.get(row)
+                if last is None or last[1] != mask or last[0] != matrix_bytes:
+                    with matrix_bytes.cast('d') as values:
+                        matrix = [int(value) if mask >> k & 1 else value for k, value in enumerate(values)]
+                    last = self.last_rows[row] = (matrix_bytes.tobytes(), mask, matrix, self.buffer[start:end].decode('utf-8'))
+                matrix_bytes.release()
+                start = end
+                key, display_type, nbt, texture = self.entities[row]
+                states.append(EntityState(key, display_type, nbt, last[2], last[3], texture))
+        return states
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+# 프레임들을 컴파일한 프레임 파일 형식으로 저장하는 함수
+# frame_states는 (원본 파일 이름, 엔티티 상태 목록 또는 None)을 순서대로 내는 iterable
+def write_compiled_frames(file_path, frame_states, sources, decode_key):
+    entity_ids = {}
+    frames = {}
+    with open(file_path, 'wb') as f:
+        f.write(COMPILED_FRAMES_MAGIC)
+        for bdengine_file, entity_states in frame_states:
+            if entity_states is None:
+                frames[bdengine_file] = [f.tell(), None]
+                continue
+            matrices, rows, masks, ends = array('d'), array('I'), array('H'), array('I')
+            texts = []
+            text_size = 0
+            for state in entity_states:
+                matrices.extend(state.matrix)
+                rows.append(entity_ids.setdefault((state.display_type, state.nbt, state.texture), len(entity_ids)))
+                masks.append(sum(1 << k for k, value in enumerate(state.matrix) if type(value) is int))
+                texts.append(state.matrix_str.encode('utf-8'))
+                text_size += len(texts[-1])
+                ends.append(text_size)
+            frames[bdengine_file] = [f.tell(), len(rows)]
+            f.write(matrices.tobytes() + rows.tobytes() + masks.tobytes())
+            f.write(b'\0' * (-f.tell() % 4))
+            f.write(ends.tobytes() + b''.join(texts))
+            f.write(b'\0' * (-f.tell() % 8))
+        index_offset = f.tell()
+        index = {'version': COMPILED_FRAMES_VERSION, 'byteorder': sys.byteorder, 'decode': list(decode_key),
+                 'sources': {name: list(signature) for name, signature in sources.items()},
+                 'entities': [list(entity) for entity in entity_ids], 'frames': frames}
+        f.write(json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        f.write(index_offset.to_bytes(8, 'little'))
+
+# 컴파일한 프레임 파일을 열어 돌려주는 함수 (원본 파일이 바뀐 프레임만 디코딩해 파일을 다시 만든다)
+# bdengine_files는 입력 폴더 안의 파일 이름, 디코딩 설정(행렬 양자화 단위, 루트 모션)이 바뀌면 모두 다시 디코딩한다
+def load_compiled_frames(compiled_path, input_folder, bdengine_files, jobs, profiler=NULL_PROFILER, matrix_table=None,
+                         root_motion=False):
+    decode_key = (matrix_table.step if matrix_table is not None else None, root_motion)
+    sources = {}
+    for bdengine_file in bdengine_files:
+        stat = os.stat(os.path.join(input_folder, bdengine_file))
+        sources[bdengine_file] = (stat.st_mtime_ns, stat.st_size)
+    compiled = None
+    if os.path.isfile(compiled_path):
+        try:
+            compiled = CompiledFrames(compiled_path)
+        except (OSError, ValueError):
+            compiled = None
+        if compiled is not None and not compiled.matches(decode_key):
+            compiled.close()
+            compiled = None
+    changed_files = [f for f in bdengine_files if compiled is None or not compiled.is_current(f, sources[f])]
+    if compiled is not None and not changed_files and set(compiled.index['sources']) == set(bdengine_files):
+        print(f"컴파일한 프레임: {compiled_path} (프레임 {len(bdengine_files)}개)")
+        return compiled
+
+    paths = [os.path.join(input_folder, f) for f in changed_files]
+    if jobs > 1 and len(paths) > 1:
+        with profiler.stage('decode_pool'):
+            decoded = decode_frame_files_parallel(paths, jobs, matrix_table, root_motion)
+    else:
+        subtree_cache = {}
+        decoded = {path: decode_frame_file(path, profiler, subtree_cache, matrix_table, root_motion) for path in paths}
+    # 그대로인 프레임은 이전 파일에서 읽어 옮기므로 임시 파일에 다 쓰고 이전 파일을 닫은 뒤 교체
+    temp_path = compiled_path + '.tmp'
+    changed = set(changed_files)
+    with profiler.stage('compile'):
+        try:
+            write_compiled_frames(temp_path, ((f, decoded[os.path.join(input_folder, f)] if f in changed else compiled.states(f))
+                                              for f in bdengine_files), sources, decode_key)
+        finally:
+            if compiled is not None:
+                compiled.close()
+        os.replace(temp_path, compiled_path)
+    print(f"컴파일한 프레임: {compiled_path} (프레임 {len(bdengine_files)}개 중 {len(changed_files)}개 컴파일)")
+    return CompiledFrames(compiled_path)
+
+# mcfunction 파일을 저장하는 함수
+# output_digests가 있으면 내용이 바뀐 파일만 다시 쓴다
+def write_function_file(file_path, lines, output_digests=None):
+    text = ''.join(line + '\n' for line in lines)
+    if output_digests is not None:
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        if output_digests.get(file_path) == digest and os.path.isfile(file_path):
+            return False
+        output_digests[file_path] = digest
+    with open(file_path, 'w', encoding='utf-8') as txt_file:
+        txt_file.write(text)
+    return True
+
+# 데이터팩 .zip의 pack.mcmeta에 넣을 pack_format (1.21부터 함수 폴더 이름이 function)
+DATAPACK_FORMAT = 48
+DATAPACK_FUNCTION_FOLDER = 'function'
+
+# .zip 항목의 수정 시각 (같은 결과면 같은 .zip이 나오도록 고정)
+DATAPACK_ZIP_TIME = (1980, 1, 1, 0, 0, 0)
+
+# 네임스페이스 설정(예: ns:anim/)의 함수가 들어가는 .zip 안의 경로 (예: data/ns/function/anim/)
+def datapack_function_root(namespace):
+    namespace_id, _, function_prefix = (namespace or '').rpartition(':')
+    return f"data/{namespace_id or 'minecraft'}/{DATAPACK_FUNCTION_FOLDER}/{function_prefix}"
+
+# 변환 결과를 데이터팩 .zip 하나로 쓰는 클래스 (--zip)
+# 함수는 네임스페이스 설정(예: ns:anim/)에 맞춰 data/ns/function/anim/ 아래에 들어간다
+# 임시 파일에 함수마다 한 번씩 쓰고, commit에서만 기존 .zip과 바꾸므로 변환이 중간에 실패해도 기존 .zip은 그대로 남는다
+class DatapackZipOutput:
+    def __init__(self, zip_path, namespace):
+        self.function_root = datapack_function_root(namespace)
+        self.zip_path = zip_path
+        self.temp_path = f"{zip_path}.tmp"
+        if os.path.dirname(zip_path):
+            os.makedirs(os.path.dirname(zip_path), exist_ok=True)
+        self.zip_file = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED)
+        self.function_count = 0
+
+    # 출력 폴더 기준 경로(예: f3.mcfunction, frame_tree/0_5.mcfunction)의 함수를 .zip에 넣는 함수
+    def write(self, relative_path, lines):
+        self.add_entry(self.function_root + relative_path.replace(os.sep, '/'), ''.join(line + '\n' for line in lines))
+        self.function_count += 1
+
+    def add_entry(self, name, text):
+        info = zipfile.ZipInfo(name, DATAPACK_ZIP_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self.zip_file.writestr(info, text.encode('utf-8'))
+
+    # pack.mcmeta를 넣고 기존 .zip을 한 번에 바꾸는 함수
+    def commit(self):
+        pack = {'pack': {'pack_format': DATAPACK_FORMAT, 'description': 'BDEngine animation'}}
+        self.add_entry('pack.mcmeta', json.dumps(pack, indent=2) + '\n')
+        self.zip_file.close()
+        os.replace(self.temp_path, self.zip_path)
+
+    # 쓰던 임시 파일을 버리는 함수
+    def abort(self):
+        self.zip_file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+# frame 파일의 이진 탐색 트리 노드를 저장하는 하위 폴더
+FRAME_TREE_FOLDER = 'frame_tree'
+
+# 트리 잎 노드 하나에서 직접 검사할 최대 스코어 개수
+FRAME_TREE_LEAF_SIZE = 4
+
+# 디스패처 항목 [(최소 스코어, 최대 스코어, 함수 이름)]으로 이진 탐색 디스패처 트리를 만드는 함수
+# frame 파일에 들어갈 라인과 {노드 이름: 라인 목록}을 반환 (프레임-스코어 대응은 그대로, 노드는 folder 아래에 저장)
+def build_frame_tree(dispatch_entries, temporary_player_name, scoreboard_name, namespace, folder=FRAME_TREE_FOLDER):
+    # 같은 스코어 범위에 걸린 함수는 한 그룹으로 묶어 원래 순서대로 모두 실행
+    score_groups = {}
+    for low, high, function_name in dispatch_entries:
+        score_groups.setdefault((low, high), []).append(function_name)
+    scores = sorted(score_groups)
+    nodes = {}
+
+    def matches(low, high):
+        return f"{low}" if low == high else f"{low}..{high}"
+
+    def dispatch_line(score_range, function_name):
+        return f"execute if score {temporary_player_name} {scoreboard_name} matches {score_range} run function {namespace}{function_name}"
+
+    def build(low, high):
+        if high - low <= FRAME_TREE_LEAF_SIZE:
+            return [dispatch_line(matches(*score), function_name) for score in scores[low:high] for function_name in score_groups[score]]
+        middle = (low + high) // 2
+        lines = []
+        for start, end in ((low, middle), (middle, high)):
+            node_name = f"{folder}/{scores[start][0]}_{scores[end - 1][1]}"
+            nodes[node_name] = build(start, end)
+            lines.append(dispatch_line(f"{scores[start][0]}..{scores[end - 1][1]}", node_name))
+        return lines
+
+    return build(0, len(scores)), nodes
+
+# 반복 구간 노드를 저장하는 하위 폴더와 나머지 계산에 쓰는 가짜 플레이어
+FRAME_LOOP_FOLDER = 'frame_loop'
+FRAME_LOOP_HOLDER = '#frame_loop'
+FRAME_LOOP_PERIOD_HOLDER = '#frame_loop_period'
+
+# 반복 구간을 찾을 때 볼 최대 주기(디스패처 항목 수)
+FRAME_LOOP_MAX_PERIOD = 256
+
+# 반복 구간 노드가 추가로 쓰는 명령 수 (주기 + 이 값보다 많은 디스패처 라인을 줄일 때만 접음)
+FRAME_LOOP_OVERHEAD = 4
+
+# 스코어 순서의 디스패처 항목 [(스코어, 함수 이름)]에서 같은 주기로 되풀이되는 구간을 모두 찾는 함수
+# (시작, 주기, 끝) 목록을 반환: [시작, 시작 + 주기)는 그대로 두고, [시작 + 주기, 끝)은 한 주기 앞의 항목과
+# 같은 함수이며 스코어도 같은 간격(주기 길이)만큼 떨어져 있어서 나머지 연산으로 첫 주기에 접을 수 있다
+def find_frame_loops(entries):
+    scores = [score for score, _ in entries]
+    names = [function_name for _, function_name in entries]
+    # ties[k]: 1..k 중 바로 앞 항목과 스코어가 같은 항목 수 (한 주기 안의 스코어는 모두 달라야 접을 수 있음)
+    ties = [0]
+    for k in range(1, len(entries)):
+        ties.append(ties[-1] + (scores[k] == scores[k - 1]))
+    loops = []
+
+    def search(low, high):
+        best = None  # (줄어드는 라인 수, 시작, 주기, 끝)
+        for period in range(1, min(FRAME_LOOP_MAX_PERIOD, (high - low) // 2) + 1):
+            run_start = None
+            for j in range(low, high - period + 1):
+                matched = (j < high - period and names[j] == names[j + period] and ties[j + period] == ties[j])
+                if (matched and run_start is not None
+                        and scores[j + period] - scores[j] == scores[j + period - 1] - scores[j - 1]):
+                    continue
+                if run_start is not None:
+                    saved = j - run_start - period - FRAME_LOOP_OVERHEAD
+                    if saved > 0 and (best is None or saved > best[0]):
+                        best = (saved, run_start, period, j + period)
+                run_start = j if matched else None
+        if best is not None:
+            _, start, period, end = best
+            loops.append((start, period, end))
+            search(low, start + period)
+            search(end, high)
+
+    search(0, len(entries))
+    return sorted(loops)
+
+# 반복 구간 노드의 라인을 만드는 함수
+# 플레이어 스코어를 (스코어 - 첫 주기 시작) % 주기 길이로 바꿔 첫 주기의 함수로 보낸다
+def build_frame_loop_lines(first_cycle, period_length, temporary_player_name, scoreboard_name):
+    base = first_cycle[0][0]
+    lines = [f"scoreboard players operation {FRAME_LOOP_HOLDER} {scoreboard_name} = {temporary_player_name} {scoreboard_name}"]
+    if base > 0:
+        lines.append(f"scoreboard players remove {FRAME_LOOP_HOLDER} {scoreboard_name} {base}")
+    elif base < 0:
+        lines.append(f"scoreboard players add {FRAME_LOOP_HOLDER} {scoreboard_name} {-base}")
+    lines.append(f"scoreboard players set {FRAME_LOOP_PERIOD_HOLDER} {scoreboard_name} {period_length}")
+    lines.append(f"scoreboard players operation {FRAME_LOOP_HOLDER} {scoreboard_name} %= {FRAME_LOOP_PERIOD_HOLDER} {scoreboard_name}")
+    return lines, [(score - base, score - base, function_name) for score, function_name in first_cycle]
+
+# f숫자 출력 파일 이름
+FRAME_FILE_PATTERN = re.compile(r"^f\d+\.mcfunction$")
+
+# 폴더 안의 이전 출력 파일(frame 파일, f숫자.mcfunction, 트리 노드)을 삭제하는 함수 (keep에 있는 경로는 남김)
+def clear_output_files(folder, frame_file_savename, keep=frozenset()):
+    if not folder or not folder.strip() or not os.path.isdir(folder):
+        return
+    # 삭제할 파일 이름 결정
+    if not frame_file_savename or frame_file_savename.strip() == "":  # frame_file_savename이 공백이거나 None인 경우
+        frame_filename = "frame.mcfunction"
+    else:  # frame_file_savename이 있는 경우
+        frame_filename = f"{frame_file_savename}.mcfunction"
+    # 폴더를 한 번만 훑고, 파일 종류는 디렉터리 항목에 들어 있는 정보로 확인
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name in (FRAME_TREE_FOLDER, FRAME_LOOP_FOLDER, FRAME_ENTITY_FOLDER, FRAME_SPLIT_FOLDER) and entry.is_dir():
+                # 트리 노드, 반복 구간 노드, 엔티티 함수, 나눈 프레임 조각 (반복 구간 안의 트리 노드는 한 단계 아래 폴더에 있음)
+                for node_folder, _, filenames in os.walk(entry.path):
+                    for filename in filenames:
+                        node_path = os.path.join(node_folder, filename)
+                        if filename.endswith('.mcfunction') and os.path.normpath(node_path) not in keep:
+                            os.remove(node_path)
+            elif ((entry.name == frame_filename or FRAME_FILE_PATTERN.match(entry.name)) and entry.is_file()
+                    and os.path.normpath(entry.path) not in keep):
+                os.remove(entry.path)
+
+# 정적 비용 분석에서 틱(스코어)마다 세는 항목 (--analyze)
+# commands: 실행되는 명령 수, dispatcher_checks: 스코어 검사 수, selector_scans: @e 선택자로 엔티티를 훑는 수,
+# uuid_targets: UUID로 바로 찾는 대상 수, nbt_bytes: data merge로 합치는 NBT 크기, texture_bytes: 머리 텍스처 값 크기,
+# entity_runs: execute as 선택자로 엔티티마다 함수를 실행한 수
+COST_FIELDS = ('commands', 'dispatcher_checks', 'selector_scans', 'uuid_targets', 'nbt_bytes', 'texture_bytes', 'entity_runs')
+
+# 틱당 명령 예산이 없을 때 표시할 틱 명령 수 기준
+COST_WARNING_COMMANDS = 1000
+
+# 비용 히스토그램의 칸 수와 막대 최대 길이
+COST_HISTOGRAM_BINS = 10
+COST_HISTOGRAM_WIDTH = 40
+
+# 비용 분석에서 알아보는 명령 형식
+DISPATCH_LINE_PATTERN = re.compile(r'execute if score (\S+) (\S+) matches (-?\d+)(?:\.\.(-?\d+))? run (return run )?(.+)$')
+ENTITY_CALL_PATTERN = re.compile(r'execute as @e\[[^\]]*\] run function (\S+)$')
+ENTITY_SETUP_PATTERN = re.compile(r'scoreboard players set @e\[[^\]]*\] \S+ (-?\d+)$')
+SCOREBOARD_LINE_PATTERN = re.compile(r'scoreboard players (set|add|remove|operation) (\S+) (\S+) (\S+)(?: (\S+) (\S+))?$')
+FUNCTION_CALL_PATTERN = re.compile(r'(?:^|\brun )function (\S+)(?: with storage \S+ (\S+))?$')
+ENTITY_TARGET_PATTERN = re.compile(r'(?:data merge|item replace) entity (\S+)')
+MERGE_NBT_PATTERN = re.compile(r'data merge entity \S+ (\{.*\})$')
+TEXTURE_VALUE_PATTERN = re.compile(r'value:"([^"]*)"')
+UUID_TARGET_PATTERN = re.compile(r'^[a-zA-Z0-9]+(-[a-zA-Z0-9]+){4}$')
+
+# 출력된 함수를 frame 파일부터 틱마다 따라가며 명령 비용을 세는 클래스 (--analyze)
+# 디스패처 트리와 반복 구간 노드의 스코어 계산은 그대로 따라가고, 매크로 함수는 한 번 실행으로 센다
+# 모델 태그로 부르는 엔티티 함수는 엔티티 번호 함수에 있는 엔티티마다 @s의 번호로 트리를 따라가 센다
+class CostAnalyzer:
+    def __init__(self, read_function, namespace, temporary_player_name):
+        self.read_function = read_function  # 함수 이름(네임스페이스 경로 아래) -> 라인 목록, 없으면 None
+        self.namespace = namespace or ''
+        self.temporary_player_name = temporary_player_name
+        self.functions = {}
+        self.scores = {}
+        self.ticks = []  # [(스코어, 실행된 프레임 함수 이름 목록, 비용)]
+        # 머리 텍스처 표 (머리 텍스처 저장소 모드)와 스코어별 프레임 명령 (재생 방식 1)
+        self.textures = [value for line in self.function_lines(TEXTURE_SETUP_FUNCTION)[1:]
+                         for value in TEXTURE_VALUE_PATTERN.findall(line)]
+        self.frame_data = {}
+        for line in self.function_lines(FRAME_SETUP_FUNCTION)[1:]:
+            match = re.match(r"data modify storage \S+ list\.s(-?\d+) set value \[(.*)\]$", line)
+            if match:
+                self.frame_data[int(match.group(1))] = [re.sub(r"\\(.)", r"\1", command)
+                                                        for command in re.findall(r"\{cmd:'((?:[^'\\]|\\.)*)'\}", match.group(2))]
+        # 엔티티 함수를 실행하는 엔티티의 번호 (선택자 방식 1)
+        self.entity_ids = []
+        for line in self.function_lines(ENTITY_SETUP_FUNCTION):
+            match = ENTITY_SETUP_PATTERN.match(line)
+            if match:
+                self.entity_ids.append(int(match.group(1)))
+
+    def function_lines(self, name):
+        if name not in self.functions:
+            self.functions[name] = self.read_function(name) or []
+        return self.functions[name]
+
+    # 스코어 하나에서 frame 파일을 실행했을 때의 비용을 더함
+    def analyze_tick(self, frame_lines, score):
+        self.scores = {self.temporary_player_name: score}
+        costs = dict.fromkeys(COST_FIELDS, 0)
+        frames = []
+        self.run_lines(frame_lines, costs, frames)
+        self.ticks.append((score, frames, costs))
+
+    # 라인을 차례로 실행하며 비용을 더함, return run 라인이 실행되면 True (함수의 나머지 라인을 건너뜀)
+    def run_lines(self, lines, costs, frames):
+        for line in lines:
+            costs['commands'] += 1
+            match = DISPATCH_LINE_PATTERN.match(line)
+            if match:
+                costs['dispatcher_checks'] += 1
+                value, low = self.scores.get(match.group(1)), int(match.group(3))
+                high = int(match.group(4)) if match.group(4) else low
+                if value is None or not low <= value <= high:
+                    continue
+                command = match.group(6)
+                if command.startswith(f"function {self.namespace}"):
+                    function_name = command[len(f"function {self.namespace}"):]
+                    if not function_name.startswith((FRAME_TREE_FOLDER + '/', FRAME_LOOP_FOLDER + '/', FRAME_ENTITY_FOLDER + '/')):
+                        frames.append(function_name)
+                    self.run_lines(self.function_lines(function_name), costs, frames)
+                else:
+                    self.count_command(command, costs, frames)
+                if match.group(5):
+                    return True
+                continue
+            match = SCOREBOARD_LINE_PATTERN.match(line)
+            if match:
+                self.run_scoreboard(match)
+                continue
+            self.count_command(line, costs, frames)
+        return False
+
+    # 반복 구간 노드의 가짜 플레이어 스코어 계산
+    def run_scoreboard(self, match):
+        operation, holder, value = match.group(1), match.group(2), match.group(4)
+        if operation == 'set':
+            self.scores[holder] = int(value)
+        elif operation in ('add', 'remove') and holder in self.scores:
+            self.scores[holder] += int(value) if operation == 'add' else -int(value)
+        elif operation == 'operation' and match.group(5) in self.scores:
+            source = self.scores[match.group(5)]
+            if value == '=':
+                self.scores[holder] = source
+            elif value == '%=' and holder in self.scores and source:
+                self.scores[holder] %= source
+
+    # 프레임 명령 하나의 대상과 NBT, 텍스처 크기를 세고, 부르는 함수가 있으면 따라감
+    def count_command(self, line, costs, frames):
+        costs['selector_scans'] += line.count('@e[')
+        match = ENTITY_TARGET_PATTERN.search(line)
+        if match and UUID_TARGET_PATTERN.match(match.group(1)):
+            costs['uuid_targets'] += 1
+        match = MERGE_NBT_PATTERN.search(line)
+        if match:
+            costs['nbt_bytes'] += len(match.group(1).encode('utf-8'))
+        costs['texture_bytes'] += sum(len(value) for value in TEXTURE_VALUE_PATTERN.findall(line))
+        match = FUNCTION_CALL_PATTERN.search(line)
+        if not match or not match.group(1).startswith(self.namespace):
+            return
+        function_name = match.group(1)[len(self.namespace):]
+        if function_name == HEAD_MACRO_FUNCTION:
+            # 텍스처 표의 번호로 머리를 바꾸는 매크로 (item replace 한 줄)
+            costs['commands'] += 1
+            index = re.search(r'\[(\d+)\]$', match.group(2) or '')
+            if index and int(index.group(1)) < len(self.textures):
+                costs['texture_bytes'] += len(self.textures[int(index.group(1))])
+        elif function_name == FRAME_PLAYER_FUNCTION:
+            # 재생 방식 1: 목록을 꺼내는 2줄, 명령마다 재생 함수 4줄과 명령 1줄, 목록 끝 검사 1줄
+            commands = self.frame_data.get(self.scores.get(self.temporary_player_name), [])
+            if commands:
+                frames.append(f"{FRAME_STORAGE}.s{self.scores[self.temporary_player_name]}")
+            costs['commands'] += 3 + 4 * len(commands)
+            for command in commands:
+                costs['commands'] += 1
+                self.count_command(command, costs, frames)
+        elif ENTITY_CALL_PATTERN.match(line) and self.entity_ids:
+            # 선택한 엔티티마다 한 번씩 실행 (엔티티 함수는 @s의 엔티티 번호로 찾아감)
+            for entity_id in self.entity_ids:
+                self.scores['@s'] = entity_id
+                self.run_lines(self.function_lines(function_name), costs, frames)
+            self.scores.pop('@s', None)
+            costs['entity_runs'] += len(self.entity_ids)
+        else:
+            if ENTITY_CALL_PATTERN.match(line):
+                costs['entity_runs'] += 1
+            self.run_lines(self.function_lines(function_name), costs, frames)
+
+    # 항목별 합계와 틱 최대값
+    def totals(self):
+        return {name: sum(costs[name] for _, _, costs in self.ticks) for name in COST_FIELDS}
+
+    def peaks(self):
+        return {name: max((costs[name] for _, _, costs in self.ticks), default=0) for name in COST_FIELDS}
+
+    # 틱 명령 수 히스토그램 [(최소, 최대, 틱 수)], 가장 가벼운 틱부터 가장 무거운 틱까지를 나눔
+    def histogram(self):
+        if not self.ticks:
+            return []
+        lightest = min(costs['commands'] for _, _, costs in self.ticks)
+        width = max(1, -(-(self.peaks()['commands'] - lightest + 1) // COST_HISTOGRAM_BINS))
+        bins = [0] * ((self.peaks()['commands'] - lightest) // width + 1)
+        for _, _, costs in self.ticks:
+            bins[(costs['commands'] - lightest) // width] += 1
+        return [(lightest + index * width, lightest + (index + 1) * width - 1, count) for index, count in enumerate(bins)]
+
+    # 명령 수가 기준을 넘는 틱
+    def flagged_ticks(self, threshold):
+        return [(score, frames, costs) for score, frames, costs in self.ticks if costs['commands'] > threshold]
+
+    # JSON 보고서 저장
+    def write_report(self, report_path, threshold):
+        report = {
+            'threshold': threshold,
+            'totals': self.totals(),
+            'peaks': self.peaks(),
+            'histogram': [{'min': low, 'max': high, 'ticks': count} for low, high, count in self.histogram()],
+            'flagged': [score for score, _, _ in self.flagged_ticks(threshold)],
+            'ticks': [dict(score=score, frames=frames, **costs) for score, frames, costs in self.ticks],
+        }
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # 콘솔 요약 출력
+    def print_summary(self, threshold):
+        totals, peaks = self.totals(), self.peaks()
+        print(f"틱 {len(self.ticks)}개의 명령 비용 (합계 / 틱 최대):")
+        for name in COST_FIELDS:
+            print(f"  {name:<18} {totals[name]:10} / {peaks[name]:8}")
+        histogram = self.histogram()
+        most = max((count for _, _, count in histogram), default=0) or 1
+        print("틱당 명령 수 히스토그램:")
+        for low, high, count in histogram:
+            print(f"  {low:6}..{high:<6} {'#' * -(-count * COST_HISTOGRAM_WIDTH // most):<{COST_HISTOGRAM_WIDTH}} {count}")
+        flagged = self.flagged_ticks(threshold)
+        print(f"명령 {threshold}개를 넘는 틱 {len(flagged)}개")
+        for score, frames, costs in flagged:
+            print(f"  스코어 {score}: 명령 {costs['commands']}개, @e {costs['selector_scans']}번, NBT {costs['nbt_bytes']}바이트 "
+                  f"({', '.join(frames) or '프레임 없음'})")
 
 # 파일 이름에서 숫자 추출하는 함수
 def extract_number_from_filename(filename):
@@ -191,443 +1890,1124 @@ def extract_values_from_filename(filename):
     return i_value, s_value, tttal
 
 
-head_value_pattern = re.compile(r', item:\{id:player_head,components:\{"profile":\{properties:\[\{name:textures,value:"[a-zA-Z0-9=]+"\}\]\}\}\}')
-tag_pattern = re.compile(r'(tag=[a-zA-Z0-9_]+,*)+')
-uuid_pattern = re.compile(r'[a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*')
-transformation_pattern = re.compile(r'transformation:\[([+-]?\d*(?:\.\d+)?f?,)*[+-]?\d*(?:\.\d+)?f?\](, )?')
-
 # 파일 이름에서 숫자 추출하는 함수
 def extract_number_from_filename(filename):
     match = re.search(r'f(\d+)', filename)
     return int(match.group(1)) if match else float('inf')
 
 
-# .bdengine 파일을 처리하는 메인 함수 (수정된 부분 포함)
-def process_bdengine_file():
-    # f숫자 형식에 맞는 .bdengine 파일만 선택
-    bdengine_files = [f for f in os.listdir() if re.search(r'f\d+.*\.bdengine$', f)]
-    
-    # 가장 큰 숫자를 가진 파일을 먼저 처리하고, 나머지는 오름차순으로 정렬
-    bdengine_files.sort(key=lambda x: extract_number_from_filename(x))  # 숫자 기준으로 정렬
-    largest_file = bdengine_files[-1]  # 가장 큰 숫자를 가진 파일을 찾음
-    bdengine_files.remove(largest_file)  # 그 파일을 리스트에서 제거
-    bdengine_files.insert(0, largest_file)  # 그 파일을 첫 번째로 처리하도록 리스트의 맨 앞에 추가
-    bdengine_files.append(largest_file)  # 그 파일을 마지막에도 추가
-    # 설정 파일에서 설정값 읽어오기
-    def load_config(file_path):
-        config = {}
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                # 설정 1~5까지 읽어서 딕셔너리에 저장
-                for line in file:
-                    line = line.strip()  # 줄 끝의 개행 문자 제거
-                    if ':' in line:
-                        key, value = line.split(':', 1)
-                        config[key.strip()] = value.strip()  # 키와 값의 앞뒤 공백 제거
-        except FileNotFoundError:
-            print(f"{file_path} 파일을 찾을 수 없습니다.")
-            return None  # 파일을 찾을 수 없으면 None 반환
-        return config
-    
-    
-    # 설정 값 불러오기
-    config = load_config('setting.txt')  # setting.txt 파일에서 설정값을 읽어옴
-    
-    # 설정1
-    if config:
-        scoreboard_start_value = 0  # 기본값을 0으로 설정
-        mode_input = config.get('생성모드', None)
-        mode = int(mode_input) if mode_input else 0  # 문자열을 정수형으로 변환, 값이 없으면 0
-        temporary_player_name = config.get('임시플레이어(선택)', None)  # 설정3의 값을 temporary_player_name에 할당
-        scoreboard_name = config.get('스코어 이름(선택)', None)  # 설정4의 값을 scoreboard_name에 할당
-        default_interpolation_value_input = config.get('기본 보간값(선택)', None)
-        scoreboard_start_value_input = config.get('시작 스코어 값(선택)', 0)
+# 설정 파일(setting.txt)을 {키: 값}으로 읽는 함수 (파일이 없으면 None)
+def load_config(file_path):
+    config = {}
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            # 설정 1~5까지 읽어서 딕셔너리에 저장
+            for line in file:
+                line = line.strip()  # 줄 끝의 개행 문자 제거
+                if ':' in line:
+                    key, value = line.split(':', 1)
+                    config[key.strip()] = value.strip()  # 키와 값의 앞뒤 공백 제거
+    except FileNotFoundError:
+        print(f"{file_path} 파일을 찾을 수 없습니다.")
+        return None  # 파일을 찾을 수 없으면 None 반환
+    return config
+
+
+# BDEngine 애니메이션 하나를 mcfunction으로 바꾸는 변환기
+# config는 load_config가 돌려주는 설정, input_folder는 f숫자 .bdengine 파일이 있는 폴더, output_folder는 기본 출력 폴더
+# 모듈을 불러올 때는 아무 파일도 읽지 않으므로 다른 프로그램에서 불러와 여러 작업에 재사용할 수 있다
+# matrix_tables를 넘기면 여러 변환기가 {단위: 행렬 양자화 표}를 함께 쓴다 (일괄 변환)
+class Converter:
+    def __init__(self, config, input_folder='.', output_folder='result', matrix_tables=None):
+        # 일부 키만 있는 dict나 문자열이 아닌 값도 받도록, setting.txt를 읽은 것과 같은 형태(빠진 키는 빈 문자열)로 맞춘다
+        config = {key: '' if value is None else str(value).strip() for key, value in config.items()}
+        self.config = config
+        self.input_folder = input_folder
+        self.result_folder = output_folder
+        self.matrix_tables = matrix_tables
+
+        # 설정1
+        self.scoreboard_start_value = 0  # 기본값을 0으로 설정
+        mode_input = config.get('생성모드', '')
+        self.mode = int(mode_input) if mode_input else 0  # 문자열을 정수형으로 변환, 값이 없으면 0
+        self.temporary_player_name = config.get('임시플레이어(선택)', '')  # 설정3의 값을 temporary_player_name에 할당
+        self.scoreboard_name = config.get('스코어 이름(선택)', '')  # 설정4의 값을 scoreboard_name에 할당
+        self.default_interpolation_value_input = config.get('기본 보간값(선택)', '')
+        scoreboard_start_value_input = config.get('시작 스코어 값(선택)', '')
         if scoreboard_start_value_input.isdigit():
-            scoreboard_start_value = int(scoreboard_start_value_input)
-        namespace = config.get('네임스페이스', None)
-        frame_file_savename = config.get('score저장이름(기본값frame)', None)
-        save_dnlcl = config.get('frame저장위치(선택)', None)
-        save_dnlcl_ifsocre = config.get('score저장위치(선택)', None)
-        current_score = scoreboard_start_value
-    
-        # 출력
-        print(f"설정 값 불러오기 성공: {config}")
-    else:
-        print("설정 값을 불러오는 데 실패했습니다.")
-    
-    # 'result' 폴더가 없다면 생성
-    result_folder = 'result'
-    # 'result' 폴더 내의 파일 삭제
-    for filename in os.listdir(result_folder):
-        file_path = os.path.join(result_folder, filename)
-        if os.path.isfile(file_path):
-            # 삭제할 파일 이름 결정
-            if not frame_file_savename or frame_file_savename.strip() == "":  # frame_file_savename이 공백이거나 None인 경우
-                if filename == "frame.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                    os.remove(file_path)
-            else:  # frame_file_savename이 있는 경우
-                if filename == f"{frame_file_savename}.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                    os.remove(file_path)
-    
-    # 폴더 내 파일 삭제 (save_dnlcl)
-    if save_dnlcl and save_dnlcl.strip() and os.path.isdir(save_dnlcl):
-        for filename in os.listdir(save_dnlcl):
-            file_path = os.path.join(save_dnlcl, filename)
-            if os.path.isfile(file_path):
-                # 삭제할 파일 이름 결정
-                if not frame_file_savename or frame_file_savename.strip() == "":
-                    if filename == "frame.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                        os.remove(file_path)
-                else:
-                    if filename == f"{frame_file_savename}.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                        os.remove(file_path)
-    
-    # 폴더 내 파일 삭제 (save_dnlcl_ifsocre)
-    if save_dnlcl_ifsocre and save_dnlcl_ifsocre.strip() and os.path.isdir(save_dnlcl_ifsocre):
-        for filename in os.listdir(save_dnlcl_ifsocre):
-            file_path = os.path.join(save_dnlcl_ifsocre, filename)
-            if os.path.isfile(file_path):
-                # 삭제할 파일 이름 결정
-                if not frame_file_savename or frame_file_savename.strip() == "":
-                    if filename == "frame.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                        os.remove(file_path)
-                else:
-                    if filename == f"{frame_file_savename}.mcfunction" or re.match(r"^f\d+\.mcfunction$", filename):
-                        os.remove(file_path)
-    
-
-
-    # 초기 스코어를 scoreboard_start_value로 설정
-    
-    # Initialize first_file variable
-    first_file = True  # Initialize before use
-    current_head_values = {}
-
-
-    # 첫 번째 파일에 대한 처리
-    for bdengine_file in bdengine_files:
-        i_value, s_value, tttal = extract_values_from_filename(bdengine_file)
-
-        # i 값이 있으면 기본 보간 값 대체
-        if i_value is not None:
-            default_interpolation_value = f"{i_value}"  # i값으로 대체
+            self.scoreboard_start_value = int(scoreboard_start_value_input)
+        self.namespace = config.get('네임스페이스', '')
+        self.frame_file_savename = config.get('score저장이름(기본값frame)', '')
+        self.save_dnlcl = config.get('frame저장위치(선택)', '')
+        self.save_dnlcl_ifsocre = config.get('score저장위치(선택)', '')
+        dispatcher_mode_input = config.get('디스패처 모드(선택)', '')
+        self.dispatcher_mode = int(dispatcher_mode_input) if dispatcher_mode_input else 0  # 0: 목록, 1: 이진 탐색 트리
+        decimation_input = config.get('키프레임 감축 오차(선택)', '')
+        self.decimation_tolerance = float(decimation_input) if decimation_input else None  # 비어 있으면 감축하지 않음
+        transform_output_input = config.get('트랜스폼 출력 방식(선택)', '')
+        self.transform_output_mode = int(transform_output_input) if transform_output_input else 0  # 0: 행렬, 1: 분해된 성분
+        texture_storage_input = config.get('머리 텍스처 저장소 모드(선택)', '')
+        self.texture_storage_mode = int(texture_storage_input) if texture_storage_input else 0  # 1: 텍스처 표 + 매크로
+        frame_dedup_input = config.get('중복 프레임 합치기(선택)', '')
+        self.frame_dedup_mode = int(frame_dedup_input) if frame_dedup_input else 0  # 1: 같은 내용의 프레임과 반복 구간을 합침
+        selector_input = config.get('선택자 방식(선택)', '')
+        self.selector_mode = int(selector_input) if selector_input else 0  # 1: 생성모드 1에서 모델 태그로 한 번만 훑어 갱신
+        self.model_tag = config.get('모델 태그(선택)', '') or None  # 비어 있으면 모든 태그 엔티티에 공통인 태그를 찾아 씀
+        tick_budget_input = config.get('틱당 명령 예산(선택)', '')
+        self.tick_budget = int(tick_budget_input) if tick_budget_input else None  # 비어 있으면 프레임을 나누지 않음
+        matrix_step_input = config.get('행렬 양자화 단위(선택)', '')
+        self.matrix_step = float(matrix_step_input) if matrix_step_input else None  # 비어 있으면 양자화하지 않음
+        self.decompose_tolerance = max(DECOMPOSE_TOLERANCE, self.matrix_step or 0.0)  # 양자화한 행렬은 양자화 단위 안에서 같은 분해로 봄
+        root_motion_input = config.get('루트 모션(선택)', '')
+        self.root_motion = (int(root_motion_input) if root_motion_input else 0) == 1  # 1: 최상위 이동과 회전을 tp 한 번으로
+        playback_input = config.get('재생 방식(선택)', '')
+        self.playback_mode = int(playback_input) if playback_input else 0  # 0: 프레임마다 함수, 1: data storage + 매크로 재생
+
+        # 출력 폴더 (result, save_dnlcl, save_dnlcl_ifsocre)와 f숫자 파일이 들어가는 네임스페이스 경로
+        self.output_folders = (self.result_folder, self.save_dnlcl, self.save_dnlcl_ifsocre)
+        self.function_folder = self.result_folder if self.save_dnlcl == "" else self.save_dnlcl
+        self.profiler = NULL_PROFILER
+        self.datapack = None          # 데이터팩 .zip 출력 (DatapackZipOutput), None이면 폴더에 파일로 쓴다
+        self.output_digests = None    # 캐시 모드에서 출력 파일별 내용 해시
+        self.written_paths = set()    # 이번 실행에서 폴더에 쓴 출력 파일
+        self.reset()
+
+    # 실행마다 처음부터 다시 쌓는 비교 상태를 비우는 함수
+    def reset(self):
+        self.head_values = {}         # 엔티티별로 마지막에 내보낸 머리 텍스처 번호
+        self.texture_ids = {}         # 모든 프레임의 텍스처 표 (텍스처 -> 번호)
+        self.emitted_components = {}  # 분해 출력 모드에서 엔티티별로 마지막에 보낸 성분
+        self.subtree_cache = {}       # 바뀌지 않은 하위 트리의 엔티티 상태 (build_entity_states_incremental)
+        self.matrix_table = None      # 양자화한 행렬 표 (함께 쓰는 표가 있으면 실행이 끝나도 이어서 씀)
+        if self.matrix_step and self.matrix_tables is not None:
+            self.matrix_table = self.matrix_tables.setdefault(self.matrix_step, MatrixTable(self.matrix_step))
+        elif self.matrix_step:
+            self.matrix_table = MatrixTable(self.matrix_step)
+        self.frame_digests = {}       # 중복 프레임 합치기: 프레임 함수 내용의 해시 -> 처음 쓴 프레임 번호
+        self.frame_aliases = {}       # 중복 프레임 합치기: 프레임 번호 -> 같은 내용의 먼저 쓴 프레임 번호
+        self.shared_tags = None       # 선택자 방식 1: 지금까지 본 모든 태그 엔티티에 공통인 태그
+        self.tag_sets = {}            # 선택자 방식 1: 지금까지 본 태그 엔티티의 {선택자 키: 태그 집합}
+        self.ambiguous_keys = set()   # 선택자 방식 1: 태그가 다른 엔티티 태그의 일부라서 @s 검사로 구분할 수 없는 엔티티
+        self.group_tag = None         # 선택자 방식 1: 엔티티 함수를 실행할 모델 태그 (None이면 엔티티마다 @e로 찾음)
+        self.entity_ids = {}          # 선택자 방식 1: 엔티티 함수의 @s 검사 -> 엔티티 번호 (엔티티 함수 트리의 스코어)
+        self.frame_chunks = {}        # 틱당 명령 예산: 프레임 함수 이름 -> 나눈 조각 수
+        self.pending_splits = {}      # 틱당 명령 예산: 디스패처를 만들 때 나눌 프레임 함수 이름 -> (경로, 라인 목록이나 파일, 엔티티 라인)
+        self.function_costs = {}      # 디스패처가 부르는 함수 이름 -> 명령 수 (엔티티 함수의 라인도 한 번씩 셈)
+        self.entity_targets = {}      # 루트 모션: 엔티티 키 -> 생성모드 1의 대상 선택자
+        self.root_targets = []        # 루트 모션: 루트가 바뀔 때 tp할 대상 (생성모드 0이면 @s)
+        self.emitted_root = None      # 루트 모션: 마지막으로 보낸 루트 [x, y, z, yaw] 정수
+        self.root_duration = None     # 루트 모션: 마지막으로 보낸 teleport_duration
+        self.frame_commands = {}      # 재생 방식 1: 프레임 함수 이름 -> 명령 라인 (함수 대신 data storage에 넣음)
+        self.dispatcher_path = None   # 비용 분석: 저장한 frame 파일 경로
+        self.dispatch_scores = None   # 비용 분석: 디스패처가 프레임을 실행하는 (최소 스코어, 최대 스코어)
+
+    # 텍스처 표 모드면 텍스처 표, 아니면 None (머리 텍스처를 명령에 그대로 넣음)
+    @property
+    def head_texture_ids(self):
+        return self.texture_ids if self.texture_storage_mode == 1 else None
+
+    # .bdengine 파일 내용(bytes)을 엔티티별 상태 목록으로 바꾸는 함수 (JSON이 잘못됐으면 None)
+    def convert_frame(self, raw_data):
+        return decode_frame_bytes(raw_data, self.profiler, self.subtree_cache, self.matrix_table, self.root_motion)
+
+    # 직전 프레임의 상태(첫 프레임이면 None)와 이번 프레임의 엔티티 상태를 비교해 (이번 프레임의 상태, 바뀐 엔티티 목록)을 돌려주는 함수
+    def diff(self, previous_matrices, entity_states):
+        with self.profiler.stage('diff'):
+            return diff_entity_states(previous_matrices, entity_states, self.head_values, self.texture_ids)
+
+    # 바뀐 엔티티들의 명령 라인을 만드는 함수 (previous_keys는 분해 출력 모드에서 직전 프레임에 있던 엔티티 키)
+    # (mode를 주면 그 생성모드의 형식으로 만든다)
+    def render(self, changes, default_interpolation_value, previous_keys=(), mode=None):
+        with self.profiler.stage('render'):
+            return self.render_changes(changes, default_interpolation_value, previous_keys, mode)
+
+    # render와 같지만 시간을 따로 재지 않는 함수 (스트리밍 모드는 stream 단계에서 한꺼번에 잰다)
+    def render_changes(self, changes, default_interpolation_value, previous_keys=(), mode=None):
+        mode = self.mode if mode is None else mode
+        if self.root_motion and any(change.state.display_type == ROOT_MOTION_TYPE for change in changes):
+            root_lines = [line for change in changes if change.state.display_type == ROOT_MOTION_TYPE
+                          for line in self.render_root_motion(change, default_interpolation_value)]
+            changes = [change for change in changes if change.state.display_type != ROOT_MOTION_TYPE]
+            return root_lines + self.render_changes(changes, default_interpolation_value, previous_keys, mode)
+        if self.transform_output_mode == 1:
+            return render_decomposed_changes(mode, changes, default_interpolation_value, previous_keys,
+                                             self.emitted_components, self.head_texture_ids, self.namespace,
+                                             self.decompose_tolerance)
+        return [line for change in changes
+                for line in render_entity_change(mode, change, default_interpolation_value, self.head_texture_ids, self.namespace)]
+
+    # 루트 모션 명령을 만드는 함수: 마지막으로 보낸 루트에서 바뀐 만큼 모델 엔티티를 상대 좌표로 tp하고 yaw를 돌린다
+    # 보간값이 바뀌었으면 먼저 teleport_duration을 맞춰 tp도 같은 시간 동안 부드럽게 움직이게 한다
+    def render_root_motion(self, change, default_interpolation_value):
+        root = [int(value) for value in change.state.matrix_str.split(',')]
+        previous = self.emitted_root or root
+        self.emitted_root = root
+        interpolation = str(default_interpolation_value or 0)
+        duration = min(int(interpolation), TELEPORT_DURATION_MAX) if interpolation.isdigit() else 0
+        if duration == self.root_duration:
+            duration = None
         else:
-            default_interpolation_value = default_interpolation_value_input
-
-        # 스코어 증가, 첫 번째 파일이면 1 증가하지 않음
-        if not first_file:
-            
-            # 초기 스코어를 scoreboard_start_value로 설정
-            current_score = scoreboard_start_value - 1
-             # s가 없으면 1 증가  
-
-
-
-        # 현재 파일에 대해 바로 적용할 시작값 설정
-        current_start_value = current_score if scoreboard_name else None
-
-        with open(bdengine_file, 'rb') as f:
-            decoded_data = base64.b64decode(f.read())
-        decompressed_data = gzip.decompress(decoded_data)
-        text_data = decompressed_data.decode('utf-8')
-
+            self.root_duration = duration
+        return self.root_target_lines([value - previous_value for value, previous_value in zip(root, previous)], duration)
+
+    # 루트 모션 대상마다 teleport_duration을 맞추는 라인(duration이 None이면 없음)과 delta만큼 상대 tp하는 라인을 만드는 함수
+    def root_target_lines(self, delta, duration=None):
+        lines = []
+        if duration is not None:
+            lines.extend(f"data merge entity @s {{teleport_duration:{duration}}}" if target == '@s'
+                         else f"execute as {target} run data merge entity @s {{teleport_duration:{duration}}}"
+                         for target in self.root_targets)
+        if any(delta):
+            position = ' '.join(f"~{d / ROOT_POSITION_SCALE}" if d else '~' for d in delta[:3])
+            rotation = f" ~{delta[3] / ROOT_YAW_SCALE} ~" if delta[3] else ''
+            lines.extend(f"execute {'' if target == '@s' else f'as {target} '}at @s run tp @s {position}{rotation}"
+                         for target in self.root_targets)
+        return lines
+
+    # 첫 재생 준비 함수(root_start)를 저장하는 함수
+    # 프레임의 tp는 반복 재생 기준으로 마지막 프레임의 루트에서 상대적으로 움직이는데, 소환한 자리는 루트가 0이므로
+    # 처음 재생하기 전에 모델을 마지막 프레임의 루트로 바로(teleport_duration 0) 옮겨 두어야 첫 바퀴도 같은 자리에서 재생된다
+    def write_root_start(self):
+        lines = self.root_target_lines(self.emitted_root, 0)
+        self.write_function(os.path.join(self.function_folder, f"{ROOT_START_FUNCTION}.mcfunction"), lines, self.function_folder)
+        runner = "프레임 함수를 실행하는 엔티티마다" if self.mode == 0 else "한 번"
+        print(f"루트 모션: 소환한 뒤 처음 재생하기 전에 {self.namespace}{ROOT_START_FUNCTION} 함수를 {runner} 실행하세요.")
+
+    # 엔티티 함수에서 엔티티를 찾는 번호를 넣는 함수를 저장하는 함수
+    def write_entity_setup(self):
+        lines = entity_setup_lines(self.entity_ids, self.scoreboard_name)
+        self.write_function(os.path.join(self.function_folder, f"{ENTITY_SETUP_FUNCTION}.mcfunction"), lines, self.function_folder)
+        print(f"엔티티 {len(lines)}개: 소환한 뒤 처음 재생하기 전과 변환할 때마다 {self.namespace}{ENTITY_SETUP_FUNCTION} 함수를 한 번 실행하세요.")
+
+    # 루트 모션으로 tp할 대상을 정하는 함수 (모든 프레임을 한 번 훑은 뒤)
+    # 생성모드 0은 프레임 함수를 실행하는 엔티티(@s)마다, 생성모드 1은 모델 태그로 한 번에 옮기고
+    # 모델 태그가 없는 엔티티(UUID, 태그 없음)는 하나씩 옮긴다
+    def choose_root_targets(self):
+        if not self.root_motion:
+            self.root_targets = []
+        elif self.mode == 0:
+            self.root_targets = ['@s']
+        else:
+            root_tag = self.model_tag or (sorted(self.shared_tags)[0] if self.shared_tags else None)
+            targets = [] if root_tag is None else [f"@e[tag={root_tag}]"]
+            targets.extend(target for key, target in self.entity_targets.items()
+                           if target is not None and (root_tag is None or root_tag not in self.tag_sets.get(key, ())))
+            # 같은 선택자를 고르는 엔티티가 여럿이어도 명령은 선택자마다 한 번만 보낸다
+            self.root_targets = list(dict.fromkeys(targets))
+            if root_tag is None:
+                print("모든 태그 엔티티에 공통인 태그가 없어 루트 모션을 엔티티마다 tp합니다. setting.txt의 모델 태그(선택)를 정하세요.")
+            untargeted = sum(1 for target in self.entity_targets.values() if target is None)
+            if untargeted:
+                print(f"태그도 UUID도 없는 엔티티 {untargeted}개는 명령으로 찾을 수 없어 루트 모션으로 옮기지 않습니다. "
+                      "엔티티에 태그를 붙이세요.")
+
+    # 프레임 하나의 라인을 만드는 함수 -> (프레임 함수 라인, 모델 태그로 묶은 엔티티 함수 라인)
+    # 선택자 방식 1이면 태그로 찾는 엔티티는 엔티티 함수로 모으고, 프레임 함수에서는 모델 태그로 한 번만 훑는다
+    # (엔티티 함수를 부르는 라인은 entity_call_line으로 따로 붙인다)
+    def render_frame(self, changes, default_interpolation_value, previous_keys=()):
+        if self.group_tag is None:
+            return self.render(changes, default_interpolation_value, previous_keys), []
+        grouped = [change for change in changes if self.is_grouped(change.state)]
+        if not grouped:
+            return self.render(changes, default_interpolation_value, previous_keys), []
+        direct = [change for change in changes if not self.is_grouped(change.state)]
+        lines = self.render(direct, default_interpolation_value, previous_keys)
+        return lines, add_entity_returns(self.render(grouped, default_interpolation_value, previous_keys, mode=0))
+
+    # 엔티티 함수로 모아 갱신할 엔티티인지 확인하는 함수 (모델 태그가 붙고 태그로 구분되는 태그 엔티티)
+    def is_grouped(self, state):
+        return (is_tag_selected(state) and state.key not in self.ambiguous_keys
+                and self.group_tag in process_tags(state.nbt).split(','))
+
+    # 모델 태그가 붙은 엔티티마다 프레임의 엔티티 함수를 실행하는 라인
+    def entity_call_line(self, frame_name):
+        return f"execute as @e[tag={self.group_tag}] run function {self.namespace}{FRAME_ENTITY_FOLDER}/{frame_name}"
+
+    # 프레임의 엔티티 함수와 태그 검사 트리 노드(frame_entities/f숫자/...)를 저장하는 함수, 저장한 경로 목록을 돌려준다
+    def write_entity_function(self, frame_name, entity_lines):
+        function_name = f"{FRAME_ENTITY_FOLDER}/{frame_name}"
+        entity_lines, nodes = build_entity_tree(entity_lines, self.entity_ids, self.scoreboard_name, self.namespace,
+                                                function_name)
+        entity_paths = []
+        for node_name, node_lines in [(function_name, entity_lines)] + list(nodes.items()):
+            node_path = os.path.join(self.function_folder, f"{node_name}.mcfunction")
+            if self.datapack is None:
+                os.makedirs(os.path.dirname(node_path), exist_ok=True)
+            self.write_function(node_path, node_lines, self.function_folder)
+            entity_paths.append(node_path)
+        return entity_paths
+
+    # 프레임 함수를 저장하는 함수 (lines는 엔티티 함수를 부르는 라인까지 붙은 라인 목록)
+    # 틱당 명령 예산을 넘는 프레임은 다음 프레임까지 남은 틱 수를 알아야 나눌 수 있으므로 디스패처를 만들 때 나눈다
+    def write_frame_function(self, frame_path, frame_name, lines, entity_lines=()):
+        if self.tick_budget is not None and len(lines) > self.tick_budget:
+            self.pending_splits[frame_name] = (frame_path, lines, entity_lines)
+            return
+        self.store_frame_chunks(frame_path, frame_name, [lines], entity_lines)
+
+    # 나눈 프레임 조각을 저장하는 함수, 첫 조각은 프레임 함수에, k번째 조각은 frame_split/f숫자_k에 저장하고
+    # 디스패처가 k틱 뒤(스코어 + k)에 실행한다. 엔티티 함수는 부르는 라인이 든 마지막 조각에 맞춰 보간 시작을 앞당긴다
+    def store_frame_chunks(self, frame_path, frame_name, chunks, entity_lines=()):
+        for chunk_index, chunk in enumerate(chunks):
+            function_name = frame_name if chunk_index == 0 else f"{FRAME_SPLIT_FOLDER}/{frame_name}_{chunk_index}"
+            chunk_path = frame_path if chunk_index == 0 else os.path.join(self.function_folder, f"{function_name}.mcfunction")
+            if self.playback_mode == 1:
+                self.frame_commands[function_name] = shift_start_interpolation(chunk, chunk_index)
+            else:
+                if chunk_index == 1 and self.datapack is None:
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                self.write_function(chunk_path, shift_start_interpolation(chunk, chunk_index), self.function_folder)
+            self.function_costs[function_name] = len(chunk)
+        if entity_lines:
+            self.write_entity_function(frame_name, shift_start_interpolation(entity_lines, len(chunks) - 1))
+            self.function_costs[function_name] += len(entity_lines)
+        self.frame_chunks[frame_name] = len(chunks)
+
+    # 틱당 명령 예산을 넘는 프레임을 나눠 저장하는 함수 (디스패처를 만들기 전에 호출)
+    # 프레임은 원래 스코어에서 실행하고 조각은 다음 프레임 전의 빈 틱(스코어 + k)에만 넣는다. 빈 틱이 모자라면
+    # 남은 틱에 고르게 나눠 담아 그 틱들은 예산을 넘긴다. 마지막 프레임은 다음 프레임이 없으므로 예산 크기로 나눈다
+    # (stream 방식은 라인 목록 대신 라인을 담아 둔 파일 경로를 넘기고, 읽은 뒤 지운다)
+    def split_pending_frames(self, score_interpolation):
+        scores = sorted(set(score_interpolation.values()))
+        next_scores = dict(zip(scores, scores[1:]))
+        slots = {}  # 프레임 함수 이름 -> 다음 프레임까지 쓸 수 있는 틱 수 (같은 프레임을 여러 번 부르면 가장 작은 값)
+        for key, score in score_interpolation.items():
+            frame_name = f"f{self.frame_aliases.get(key, key)}"
+            if score in next_scores:
+                slots[frame_name] = min(slots.get(frame_name, next_scores[score] - score), next_scores[score] - score)
+        crowded_frames = 0
+        for frame_name, (frame_path, lines, entity_lines) in self.pending_splits.items():
+            if isinstance(lines, str):
+                split_path = lines
+                with open(split_path, encoding='utf-8') as split_file:
+                    lines = [line.rstrip('\n') for line in split_file]
+                os.remove(split_path)
+            chunk_size = self.tick_budget
+            slot = slots.get(frame_name)
+            if slot is not None and -(-len(lines) // chunk_size) > slot:
+                chunk_size = -(-len(lines) // slot)
+                crowded_frames += 1
+            self.store_frame_chunks(frame_path, frame_name, [lines[start:start + chunk_size]
+                                                             for start in range(0, len(lines), chunk_size)], entity_lines)
+        self.pending_splits = {}
+        if crowded_frames:
+            print(f"다음 프레임까지 빈 틱이 모자라 예산 안으로 다 나누지 못한 프레임: {crowded_frames}개 "
+                  f"(프레임 간격을 늘리거나 예산을 올리세요)")
+
+    # 프레임 내용의 해시 (중복 프레임 합치기)
+    # 엔티티 함수를 부르는 라인은 프레임마다 이름이 달라서 빼고, 대신 엔티티 함수의 내용을 더한다
+    def frame_digest(self, lines, entity_lines):
+        frame_hash = hashlib.sha1(''.join(line + '\n' for line in lines).encode('utf-8'))
+        if entity_lines:
+            frame_hash.update(b'\0' + ''.join(line + '\n' for line in entity_lines).encode('utf-8'))
+        return frame_hash.digest()
+
+    # 태그 엔티티의 태그 집합과 모든 태그 엔티티에 공통인 태그(모델 태그 추정용)를 모으면서 엔티티 상태를 그대로 흘려보내는 함수
+    # (루트 모션이면 엔티티마다 생성모드 1의 대상 선택자도 모은다)
+    def collect_entity_tags(self, entity_states):
+        for state in entity_states:
+            if is_tag_selected(state) and state.key not in self.tag_sets:
+                tags = frozenset(process_tags(state.nbt).split(','))
+                self.tag_sets[state.key] = tags
+                self.shared_tags = set(tags) if self.shared_tags is None else self.shared_tags & tags
+            if self.root_motion and state.display_type != ROOT_MOTION_TYPE and state.key not in self.entity_targets:
+                # 태그도 UUID도 없는 엔티티는 명령으로 찾을 수 없으므로 대상 없음(None)
+                target = resolve_command_target(1, state.display_type, state.nbt)[1]
+                self.entity_targets[state.key] = target if target.startswith('@') or UUID_STRING_PATTERN.search(state.nbt) else None
+            yield state
+
+    # 같은 타입의 다른 엔티티 태그 집합에 모두 들어 있는 태그 집합의 엔티티를 찾는 함수
+    # 엔티티 함수의 @s[tag=...] 검사가 다른 엔티티에도 맞으므로 이런 엔티티는 원래대로 @e로 찾는다
+    def find_ambiguous_keys(self):
+        keys_with_tag = {}
+        for key, tags in self.tag_sets.items():
+            for tag in tags:
+                keys_with_tag.setdefault((key[0], tag), set()).add(key)
+        ambiguous_keys = set()
+        for key, tags in self.tag_sets.items():
+            candidates = min((keys_with_tag[(key[0], tag)] for tag in tags), key=len)
+            if any(other != key and tags <= self.tag_sets[other] for other in candidates):
+                ambiguous_keys.add(key)
+        return ambiguous_keys
+
+    # 선택자 방식 1에서 엔티티 함수를 실행할 모델 태그를 정하는 함수 (재생 방식 1은 엔티티 함수를 쓰지 않음)
+    def choose_group_tag(self):
+        if self.selector_mode != 1 or self.mode != 1 or self.playback_mode == 1:
+            self.group_tag = None
+        elif self.model_tag:
+            self.group_tag = self.model_tag
+            self.ambiguous_keys = self.find_ambiguous_keys()
+        elif self.shared_tags:
+            self.group_tag = sorted(self.shared_tags)[0]
+            self.ambiguous_keys = self.find_ambiguous_keys()
+            print(f"모델 태그: {self.group_tag} (모든 태그 엔티티에 공통인 태그)")
+        else:
+            self.group_tag = None
+            print("모든 태그 엔티티에 공통인 태그가 없어 엔티티마다 @e로 찾습니다. setting.txt의 모델 태그(선택)를 정하세요.")
+
+    # 분해 출력 모드의 시작 성분을 정하는 함수 (반복 재생 기준으로 마지막 프레임의 성분에서 시작)
+    def seed_components(self, entity_states):
+        if self.root_motion:
+            # 루트 모션이면 첫 프레임에서 모든 성분을 보낸다 (소환할 때의 자세에는 루트가 들어 있음)
+            self.emitted_components = {}
+            return
+        self.emitted_components = dict(zip((state.key for state in entity_states),
+                                           decompose_transforms([state.matrix for state in entity_states], self.decompose_tolerance)))
+
+    # 처리할 f숫자 .bdengine 파일 이름 목록을 만드는 함수
+    # 가장 큰 번호의 파일을 맨 앞과 맨 뒤에 한 번 더 넣는다 (반복 재생의 비교 기준)
+    def list_frame_files(self):
+        # f숫자 형식에 맞는 .bdengine 파일만 선택
+        bdengine_files = [f for f in os.listdir(self.input_folder) if re.search(r'f\d+.*\.bdengine$', f)]
+
+        # 가장 큰 숫자를 가진 파일을 먼저 처리하고, 나머지는 오름차순으로 정렬
+        bdengine_files.sort(key=lambda x: extract_number_from_filename(x))  # 숫자 기준으로 정렬
+        largest_file = bdengine_files[-1]  # 가장 큰 숫자를 가진 파일을 찾음
+        bdengine_files.remove(largest_file)  # 그 파일을 리스트에서 제거
+        bdengine_files.insert(0, largest_file)  # 그 파일을 첫 번째로 처리하도록 리스트의 맨 앞에 추가
+        bdengine_files.append(largest_file)  # 그 파일을 마지막에도 추가
+        return bdengine_files
+
+    # 파일 이름 -> 입력 폴더 안의 경로
+    def frame_path(self, bdengine_file):
+        return os.path.join(self.input_folder, bdengine_file)
+
+    # 애니메이션 전체를 변환해 .mcfunction 파일(zip_path가 있으면 데이터팩 .zip 하나)로 저장하는 함수
+    # build_cache를 넘기면 메모리에 있는 빌드 캐시를 이어서 쓰고, 갱신된 캐시를 돌려준다 (감시 모드)
+    # compiled_path가 있으면 컴파일한 프레임 파일에서 프레임을 읽는다 (원본이 바뀐 프레임만 다시 컴파일)
+    def run(self, jobs=1, cache_path=None, profile_path=None, stream=False, build_cache=None, file_signatures=None, zip_path=None,
+            compiled_path=None):
         try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
-            continue
-
-        results = []
-
-        for item in data:
-            temp = handle_top_level_data(item, mode, default_interpolation_value, temporary_player_name, scoreboard_name, current_start_value)
-            results.extend(temp)
-
-
-        current_tags = set()
-        current_transformations = {}
-
-        # 결과 필터링
-        filtered_lines = []
-        for line in results:
-            # 'execute if score None None run' 부분만 제거
-            line = line.replace("execute if score   matches None run", "")
-        
-            tag_matches = tag_pattern.findall(line)
-            if len(tag_matches) > 0: 
-                selector_key = tag_matches[0]
-            
-            uuid_matches = uuid_pattern.findall(line)
-            if len(uuid_matches) > 0: 
-                selector_key = uuid_matches[0]
-        
-            # transformation_pattern.search(line)이 None이 아닌지 체크
-            transformation_match = transformation_pattern.search(line)
-            if transformation_match:  # 만약 match가 존재하면
-                transformation_str = transformation_match[0]
+            if not zip_path:
+                return self.convert_animation(jobs, cache_path, profile_path, stream, build_cache, file_signatures, compiled_path)
+            if stream:
+                raise ValueError("스트리밍 모드는 데이터팩 .zip 출력과 함께 쓸 수 없습니다.")
+            self.datapack = DatapackZipOutput(zip_path, self.namespace)
+            try:
+                build_cache = self.convert_animation(jobs, cache_path, profile_path, stream, build_cache, file_signatures, compiled_path)
+                self.datapack.commit()
+            except BaseException:
+                self.datapack.abort()
+                raise
+            finally:
+                function_count, self.datapack = self.datapack.function_count, None
+            print(f"데이터팩 저장: {zip_path} (함수 {function_count}개)")
+            return build_cache
+        finally:
+            clear_nbt_caches()
+
+    # 같은 내용의 프레임 함수를 이미 썼으면 디스패처가 그 함수를 부르도록 하고 True를 돌려주는 함수 (중복 프레임 합치기)
+    def alias_duplicate_frame(self, frame_path, digest):
+        frame_number = extract_number_from_filename(os.path.basename(frame_path))
+        first_number = self.frame_digests.setdefault(digest, frame_number)
+        if first_number == frame_number:
+            return False
+        self.frame_aliases[frame_number] = first_number
+        return True
+
+    # 함수 하나를 출력하는 함수 (folder는 함수 경로의 기준이 되는 출력 폴더)
+    # 데이터팩 .zip 출력이면 .zip에 넣고, 아니면 폴더에 파일로 쓴다
+    def write_function(self, file_path, lines, folder):
+        if self.datapack is not None:
+            self.datapack.write(os.path.relpath(file_path, folder), lines)
+        else:
+            write_function_file(file_path, lines, self.output_digests)
+            self.written_paths.add(os.path.normpath(file_path))
+
+    def convert_animation(self, jobs, cache_path, profile_path, stream, build_cache, file_signatures, compiled_path=None):
+        self.reset()
+        bdengine_files = self.list_frame_files()
+        frame_files = sorted(set(bdengine_files))
+
+        # 단계별 시간과 통계 (--profile)
+        profiler = self.profiler = ConversionProfiler() if profile_path else NULL_PROFILER
+        compiled_frames = None
+
+        if cache_path or build_cache is not None:
+            # 캐시 모드: 바뀐 프레임만 디코딩하고, 내용이 바뀐 파일만 다시 쓴다
+            build_cache = load_build_cache(cache_path, tuple(sorted(self.config.items())), build_cache)
+            self.output_digests = build_cache['outputs']
+            frame_states = load_cached_frame_states([self.frame_path(f) for f in frame_files], build_cache, jobs,
+                                                    profiler, file_signatures, self.matrix_table, self.root_motion)
+            load_frame_states = lambda bdengine_file: frame_states.get(self.frame_path(bdengine_file))
+        else:
+            build_cache = None
+            self.output_digests = None
+            # 폴더 내의 이전 출력 파일 삭제 (result, save_dnlcl, save_dnlcl_ifsocre, 데이터팩 .zip 출력이면 폴더를 건드리지 않음)
+            with profiler.stage('clear_outputs'):
+                for folder in dict.fromkeys(self.output_folders) if self.datapack is None else ():
+                    clear_output_files(folder, self.frame_file_savename)
+
+            # 병렬 모드면 모든 프레임의 디코딩과 합성을 워커 프로세스에서 먼저 끝내 두고,
+            # 아래의 순서가 중요한 비교 및 저장 단계는 그 결과를 순서대로 사용한다
+            # (워커 안의 세부 단계 시간은 decode_pool 하나로만 잡힌다)
+            if compiled_path:
+                # 컴파일한 프레임 파일: 프레임을 쓸 때마다 그 프레임의 블록만 mmap에서 읽어 엔티티 상태를 만든다
+                with profiler.stage('compiled_load'):
+                    compiled_frames = load_compiled_frames(compiled_path, self.input_folder, frame_files, jobs, profiler,
+                                                           self.matrix_table, self.root_motion)
+                load_frame_states = compiled_frames.states
+            elif stream:
+                # 스트리밍 모드: 프레임마다 조각 단위로 읽으며 엔티티 상태를 하나씩 흘려보낸다
+                load_frame_states = lambda bdengine_file: iter_frame_entity_states(self.frame_path(bdengine_file), self.matrix_table,
+                                                                                   self.root_motion)
+            elif jobs > 1:
+                with profiler.stage('decode_pool'):
+                    frame_states = decode_frame_files_parallel([self.frame_path(f) for f in frame_files], jobs, self.matrix_table,
+                                                               self.root_motion)
+                load_frame_states = lambda bdengine_file: frame_states.get(self.frame_path(bdengine_file))
             else:
-                # transformation_str을 처리할 기본값 설정 또는 다른 처리
-                transformation_str = ""  # 예시로 빈 문자열 처리
-        
-            head_value_matches = head_value_pattern.findall(line)
-            
-            # 이후 코드에서 transformation_str을 사용하는 부분
-            # 예를 들어 필터링을 위한 추가 조건을 넣는 코드 작성
-        
-            
-            # 현재 Tag와 transformation 추가
-            current_tags.add(selector_key)
-            current_transformations[selector_key] = transformation_str
-
-            # 중복되는지 확인
-            is_head = True
-            if len(head_value_matches) == 0 or (not first_file and selector_key in previous_tags and
-                    head_value_matches[0] == previous_head_values.get(selector_key)):
-                # 중복이니 head_value 지우기
-                is_head = False
-                if len(head_value_matches) != 0: line = line.replace(head_value_matches[0], "")
-                
-
-            is_transformation = True
-            if (not first_file and selector_key in previous_tags and
-                    transformation_str == previous_transformations.get(selector_key)):
-                # 중복이니 transformation 지우기
-                is_transformation = False
-                line = line.replace(transformation_str, "")
-                line = line.replace(transformation_str, "")
-                line = re.sub(r"start_interpolation: \d+, interpolation_duration: \d+", "", line)
-                line = line.replace("data merge entity", "item replace entity")
-                line = re.sub(r"@e\[(.*?)\]", lambda m: f"@e[{m.group(1)}] container.0 with player_head[profile={{properties:[{{name:\"textures\",value:\"", line)
-                line = re.sub(r'{, item:{id:player_head,components:{"profile":{properties:\[{name:textures,value:"', '', line)
-                line = re.sub(r'\}]}}}}', '}]}]', line)
-                line = re.sub(r'item replace entity @s ', 'item replace entity @s container.0 with player_head[profile={properties:[{name:\"textures\",value:\"', line)
-                line = re.sub(r'item replace entity ([a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*)', 
-              r'item replace entity \g<1> container.0 with player_head[profile={properties:[{name:"textures",value:"', 
-              line)
-                line = re.sub(r'value:" ', 'value:"', line)
-
-
-    
-
-            # 머리, trnas 둘 다 안 들어가면 추가 하지 않기
-            if not is_head and not is_transformation: continue
-
-            if is_head and len(head_value_matches) != 0: current_head_values[selector_key] = head_value_matches[0]
-            if is_transformation: current_transformations[selector_key] = transformation_str
-
-            filtered_lines.append(line.strip())  # 공백 제거 후 추가
-        filtered_results = [line for line in filtered_lines if line]  # 빈 줄은 제거
+                # 순서대로 디코딩하므로 직전에 디코딩한 프레임과 같은 하위 트리는 다시 합성하지 않는다
+                load_frame_states = lambda bdengine_file: decode_frame_file(self.frame_path(bdengine_file), profiler,
+                                                                            self.subtree_cache, self.matrix_table, self.root_motion)
+        self.written_paths = set()
+
+        # 엔티티별 비교 상태
+        previous_matrices = None  # 직전 프레임의 엔티티별 transformation
+
+        # 가장 큰 번호의 프레임부터 한 바퀴 돌며 비교 기준 상태만 만든다
+        # (마지막 프레임에서 첫 프레임으로 넘어가는 반복 재생을 위해, 출력은 아래에서 한 번만 만든다)
+        last_states = None
+        for bdengine_file in bdengine_files:
+            entity_states = load_frame_states(bdengine_file)
+            if entity_states is None:
+                continue
+            if (self.selector_mode == 1 and self.mode == 1) or self.root_motion:
+                entity_states = self.collect_entity_tags(entity_states)
+
+            if stream:
+                try:
+                    with profiler.stage('stream'):
+                        if self.transform_output_mode == 1:
+                            # 분해 출력 모드의 시작 성분을 위해 한 프레임의 상태만 남겨 둔다
+                            entity_states = last_states = list(entity_states)
+                        previous_matrices, _ = diff_entity_states(previous_matrices, entity_states, self.head_values, self.texture_ids)
+                except json.JSONDecodeError as error:
+                    print(f"{bdengine_file} 파일을 읽지 못했습니다: {error}")
+                    continue
+            else:
+                previous_matrices, _ = self.diff(previous_matrices, entity_states)
+
+            # 파일 이름에서 숫자 추출
+            extracted_number = extract_number_from_filename(bdengine_file)
+
+        self.choose_group_tag()
+        self.choose_root_targets()
+        # 루트 모션은 반복 재생 기준으로 마지막 프레임의 루트에서 시작하고 (첫 재생 전에는 root_start로 그 자리에 옮겨 둔다),
+        # 소환할 때의 자세에는 루트가 들어 있으므로 첫 프레임에서 모든 엔티티의 루트 기준 자세를 한 번 보낸다
+        if self.root_motion and previous_matrices is not None:
+            previous_matrices = {key: value for key, value in previous_matrices.items() if key == ROOT_MOTION_KEY}
+            if previous_matrices:
+                self.emitted_root = [int(value) for value in previous_matrices[ROOT_MOTION_KEY].split(',')]
+                self.write_root_start()
+
+        # 텍스처 표 모드: 표는 data storage에 한 번만 넣고 프레임에서는 번호로 매크로 함수를 호출
+        # (위에서 모든 프레임을 한 번씩 비교했으므로 텍스처 표는 이미 완성되어 있다)
+        if self.head_texture_ids is not None:
+            setup_lines, macro_lines = build_texture_functions(self.texture_ids, self.namespace)
+            for function_name, lines in ((TEXTURE_SETUP_FUNCTION, setup_lines), (HEAD_MACRO_FUNCTION, macro_lines)):
+                self.write_function(os.path.join(self.function_folder, f"{function_name}.mcfunction"), lines, self.function_folder)
+            print(f"텍스처 표: {len(self.texture_ids)}개, 월드 로드 시 {self.namespace}{TEXTURE_SETUP_FUNCTION} 함수를 한 번 실행하세요.")
+
+        # 스트리밍 모드의 분해 출력은 반복 재생 기준으로 마지막 프레임의 성분에서 시작
+        if stream and self.transform_output_mode == 1 and last_states is not None:
+            self.seed_components(last_states)
+        last_states = None
+
+        # 초기 스코어를 scoreboard_start_value로 설정
+        current_score = self.scoreboard_start_value - 1
+
+        # 두 번째 파일부터 마지막 파일까지 처리
+        frame_outputs = []
+        frame_num = 0
+        score_interpolation = {}
+        score_interpolation[self.scoreboard_start_value] = 1
+
+
+        for bdengine_file in bdengine_files[1:]:
+            frame_num += 1
+            i_value, s_value, tttal = extract_values_from_filename(bdengine_file)
+
+            # i 값이 있으면 기본 보간 값 대체
+            if i_value is not None:
+                default_interpolation_value = f"{i_value}"  # i값으로 대체
+            else:
+                default_interpolation_value = self.default_interpolation_value_input
 
 
-        previous_tags = current_tags
-        previous_transformations = current_transformations
-        previous_head_values = current_head_values
+            current_score += s_value if s_value else 1  # s가 없으면 1 증가
 
-        if first_file:
-            first_file = False
+            if s_value == 0:
+                score_interpolation[extracted_number] = current_score - tttal - 1
+            else:
+                score_interpolation[extracted_number] = current_score - tttal
+
+            entity_states = load_frame_states(bdengine_file)
+            if entity_states is None:
+                continue
+
+            if stream:
+                # 스트리밍 모드: 비교와 명령 생성을 엔티티 하나씩 이어서 하고 줄을 바로 파일에 쓴다
+                score_interpolation_list = []
+                extracted_number = extract_number_from_filename(bdengine_file)
+                txt_file_path = os.path.join(self.function_folder, f"f{extracted_number}.mcfunction")
+                current_matrices = {}
+                change_count = line_count = 0
+                frame_hash = hashlib.sha1() if self.frame_dedup_mode == 1 else None
+                previous_keys = set(previous_matrices or ()) if self.transform_output_mode == 1 else ()
+                grouped = []  # 선택자 방식 1에서 엔티티 함수로 모을 바뀐 엔티티
+                entity_lines = []
+                entity_paths = []
+                try:
+                    with profiler.stage('stream'), \
+                            open(txt_file_path, 'w', encoding='utf-8', buffering=STREAM_WRITE_BUFFER) as txt_file:
+                        changes = iter_entity_changes(previous_matrices, entity_states, self.head_values, self.texture_ids,
+                                                      current_matrices)
+                        if self.transform_output_mode == 1:
+                            # 분해 출력은 한 프레임의 바뀐 엔티티만 모아서 만든다
+                            changes = list(changes)
+                            change_count = len(changes)
+                            if self.group_tag is not None:
+                                grouped = [change for change in changes if self.is_grouped(change.state)]
+                                changes = [change for change in changes if not self.is_grouped(change.state)]
+                            lines = self.render_changes(changes, default_interpolation_value, previous_keys)
+                            text = ''.join(line + '\n' for line in lines)
+                            txt_file.write(text)
+                            line_count = len(lines)
+                            if frame_hash is not None:
+                                frame_hash.update(text.encode('utf-8'))
+                        else:
+                            for change in changes:
+                                change_count += 1
+                                if self.group_tag is not None and self.is_grouped(change.state):
+                                    grouped.append(change)
+                                    continue
+                                if change.state.display_type == ROOT_MOTION_TYPE:
+                                    lines = self.render_root_motion(change, default_interpolation_value)
+                                else:
+                                    lines = render_entity_change(self.mode, change, default_interpolation_value,
+                                                                 self.head_texture_ids, self.namespace)
+                                for line in lines:
+                                    txt_file.write(line + '\n')
+                                    line_count += 1
+                                    if frame_hash is not None:
+                                        frame_hash.update(line.encode('utf-8') + b'\n')
+                        if grouped:
+                            # 태그로 찾는 엔티티는 엔티티 함수에 모으고 모델 태그로 한 번만 훑어 실행
+                            entity_lines = add_entity_returns(self.render_changes(grouped, default_interpolation_value,
+                                                                                  previous_keys, mode=0))
+                            entity_paths = self.write_entity_function(f"f{extracted_number}", entity_lines)
+                            txt_file.write(self.entity_call_line(f"f{extracted_number}") + '\n')
+                            line_count += 1 + len(entity_lines)
+                            if frame_hash is not None:
+                                frame_hash.update(b'\0' + ''.join(line + '\n' for line in entity_lines).encode('utf-8'))
+                except json.JSONDecodeError as error:
+                    os.remove(txt_file_path)
+                    print(f"{bdengine_file} 파일을 읽지 못했습니다: {error}")
+                    continue
+                previous_matrices = current_matrices
+                if frame_hash is not None and self.alias_duplicate_frame(txt_file_path, frame_hash.digest()):
+                    os.remove(txt_file_path)
+                    for entity_path in entity_paths:
+                        os.remove(entity_path)
+                        self.written_paths.discard(os.path.normpath(entity_path))
+                    profiler.count_frame(txt_file_path, entities=len(current_matrices), removed_by_diff=len(current_matrices) - change_count,
+                                         duplicate_frames=1)
+                    continue
+                output_bytes = (os.path.getsize(txt_file_path) + sum(os.path.getsize(entity_path) for entity_path in entity_paths)
+                                if profiler.enabled else 0)
+                if self.tick_budget is not None and line_count - len(entity_lines) > self.tick_budget:
+                    # 틱당 명령 예산을 넘는 프레임은 쓴 파일을 옮겨 두고 디스패처를 만들 때 다시 읽어 조각으로 나눈다
+                    split_path = txt_file_path + '.split'
+                    os.replace(txt_file_path, split_path)
+                    self.pending_splits[f"f{extracted_number}"] = (txt_file_path, split_path, entity_lines)
+                elif self.playback_mode == 1:
+                    # 재생 방식 1이면 쓴 파일을 다시 읽어 data storage로 옮긴다
+                    with open(txt_file_path, encoding='utf-8') as frame_file:
+                        self.write_frame_function(txt_file_path, f"f{extracted_number}",
+                                                  [line.rstrip('\n') for line in frame_file], entity_lines)
+                    os.remove(txt_file_path)
+                else:
+                    self.function_costs[f"f{extracted_number}"] = line_count
+                if self.playback_mode != 1:
+                    self.written_paths.add(os.path.normpath(txt_file_path))
+                profiler.count_frame(txt_file_path, entities=len(current_matrices), removed_by_diff=len(current_matrices) - change_count,
+                                     lines=line_count, output_bytes=output_bytes)
+                continue
+
+            # 바뀐 엔티티만 고르기
+            previous_matrices, changes = self.diff(previous_matrices, entity_states)
+            score_interpolation_list = []
+
+            # 파일 이름에서 숫자 추출
+            extracted_number = extract_number_from_filename(bdengine_file)
+
+            # 저장 경로 결정 (save_dnlcl이 비어 있으면 result_folder 경로 사용)
+            txt_file_path = os.path.join(self.function_folder, f"f{extracted_number}.mcfunction")
+
+            profiler.count_frame(txt_file_path, entities=len(entity_states), removed_by_diff=len(entity_states) - len(changes))
+            frame_outputs.append(FrameOutput(txt_file_path, default_interpolation_value, current_score,
+                                             entity_states if self.decimation_tolerance is not None or self.transform_output_mode == 1 else None,
+                                             changes))
+
+        # 보간으로 재현되는 중간 키프레임 감축 (모든 프레임에 보간값이 있어야 함)
+        if self.decimation_tolerance is not None and stream:
+            print("키프레임 감축은 모든 프레임의 상태가 필요해서 스트리밍 모드에서는 사용할 수 없습니다.")
+        elif self.decimation_tolerance is not None:
+            if all(frame.interpolation and str(frame.interpolation).isdigit() for frame in frame_outputs):
+                with profiler.stage('decimation'):
+                    removed = decimate_keyframes(frame_outputs, self.decimation_tolerance)
+                print(f"키프레임 감축: transformation 명령 {removed}개 생략")
+            else:
+                print("키프레임 감축은 모든 프레임에 보간값(기본 보간값 또는 i값)이 있어야 사용할 수 있습니다.")
+
+        # 분해 출력 모드는 반복 재생 기준으로 마지막 프레임의 성분에서 시작
+        if self.transform_output_mode == 1 and frame_outputs:
+            self.seed_components(frame_outputs[-1].entity_states)
+
+        # 바뀐 엔티티의 명령을 한 번씩 생성해 .mcfunction 파일로 결과 저장
+        for index, frame in enumerate(frame_outputs):
+            previous_keys = ()
+            if self.transform_output_mode == 1:
+                previous_keys = {state.key for state in frame_outputs[index - 1].entity_states}
+            filtered_results, entity_lines = self.render_frame(frame.changes, frame.interpolation, previous_keys)
+            if self.frame_dedup_mode == 1 and self.alias_duplicate_frame(frame.path, self.frame_digest(filtered_results, entity_lines)):
+                profiler.count_frame(frame.path, duplicate_frames=1)
+                continue
+            with profiler.stage('write'):
+                frame_name = f"f{extract_number_from_filename(os.path.basename(frame.path))}"
+                if entity_lines:
+                    filtered_results.append(self.entity_call_line(frame_name))
+                self.write_frame_function(frame.path, frame_name, filtered_results, entity_lines)
+
+            if profiler.enabled:
+                profiler.count_frame(frame.path, lines=len(filtered_results) + len(entity_lines),
+                                     texture_bytes=sum(len(change.state.texture) for change in frame.changes
+                                                       if change.is_head and self.head_texture_ids is None),
+                                     output_bytes=sum(len(line.encode('utf-8')) + 1 for line in filtered_results + entity_lines))
+
+        if not score_interpolation_list:
+            # 딕셔너리의 키-값 쌍을 튜플로 만들어 리스트로 변환
+            score_interpolation_list = list(score_interpolation.items())
+            score_interpolation_list[1] = (score_interpolation_list[1][0], score_interpolation_list[1][1])
+            #끼에엑 여기만 좀 건들이면 해결
+            if s_value == 0:
+                score_interpolation[extracted_number] = score_interpolation_list[-1][1] + 1
+            else:
+                score_interpolation[extracted_number] = score_interpolation_list[-1][1] + s_value
 
-        # 파일 이름에서 숫자 추출
-        extracted_number = extract_number_from_filename(bdengine_file)
 
+        else:
+            # score_interpolation_list가 비어 있지 않다면 빈 리스트로 초기화
+            score_interpolation_list = []
+
+        if compiled_frames is not None:
+            compiled_frames.close()
+
+        # 파일에 결과 저장
+        with profiler.stage('dispatcher'):
+            self.write_frame_dispatcher(score_interpolation)
+            if self.entity_ids:
+                self.write_entity_setup()
+
+        if build_cache is not None:
+            # 이번 애니메이션에 없는 예전 출력 파일만 정리하고 캐시 저장 (데이터팩 .zip 출력이면 폴더는 그대로)
+            with profiler.stage('cache_save'):
+                if self.datapack is None:
+                    for folder in dict.fromkeys(self.output_folders):
+                        clear_output_files(folder, self.frame_file_savename, keep=self.written_paths)
+                    for stale_path in [p for p in self.output_digests if os.path.normpath(p) not in self.written_paths]:
+                        del self.output_digests[stale_path]
+                if cache_path:
+                    save_build_cache(cache_path, build_cache)
+
+        if profiler.enabled:
+            profiler.write_report(profile_path)
+            profiler.print_summary()
+        self.profiler = NULL_PROFILER
+        return build_cache
+
+    # 프레임 번호 -> 스코어 대응으로 frame 파일(디스패처 모드면 트리 노드도)을 저장하는 함수
+    def write_frame_dispatcher(self, score_interpolation):
         # 저장 경로 결정
-        if save_dnlcl == "":
-            # save_dnlcl이 None이면 result_folder 경로 사용
-            txt_file_path = os.path.join(result_folder, f"f{extracted_number}.mcfunction")
+        if not self.save_dnlcl_ifsocre:  # save_dnlcl_ifsocre가 None이거나 빈 문자열이면
+            # save_dnlcl_ifsocre가 None이거나 빈 문자열이면 result_folder 경로 사용
+            if not self.frame_file_savename or self.frame_file_savename.strip() == "":  # frame_file_savename이 None이나 빈 문자열인 경우
+                file_path = os.path.join(self.result_folder, "frame.mcfunction")
+            else:  # frame_file_savename이 존재하는 경우
+                file_path = os.path.join(self.result_folder, f"{self.frame_file_savename}.mcfunction")
         else:
-            # save_dnlcl이 None이 아니면 save_dnlcl 경로 사용
-            txt_file_path = os.path.join(save_dnlcl, f"f{extracted_number}.mcfunction")
-        
-        # .mcfunction 파일로 결과 저장
-        with open(txt_file_path, 'w', encoding='utf-8') as txt_file:
-            for line in filtered_results:
-                txt_file.write(line + '\n')
-
-
-    # 두 번째 파일부터 마지막 파일까지 처리
-    frame_num = 0
-    score_interpolation = {}
-    score_interpolation[scoreboard_start_value] = 1
-
-
-    for bdengine_file in bdengine_files[1:]:
-        frame_num += 1
-        i_value, s_value, tttal = extract_values_from_filename(bdengine_file)
-
-        # i 값이 있으면 기본 보간 값 대체
-        if i_value is not None:
-            default_interpolation_value = f"{i_value}"  # i값으로 대체
+            # save_dnlcl_ifsocre가 None도 아니고 빈 문자열도 아니면 save_dnlcl_ifsocre 경로 사용
+            if not self.frame_file_savename or self.frame_file_savename.strip() == "":  # frame_file_savename이 None이나 빈 문자열인 경우
+                file_path = os.path.join(self.save_dnlcl_ifsocre, "frame.mcfunction")
+            else:  # frame_file_savename이 존재하는 경우
+                file_path = os.path.join(self.save_dnlcl_ifsocre, f"{self.frame_file_savename}.mcfunction")
+
+        dispatcher_folder = os.path.dirname(file_path)
+
+        # 디스패처 항목 (스코어, 최대 스코어, 함수 이름), 중복 프레임은 같은 내용의 먼저 쓴 프레임 함수를 부른다
+        # 틱당 명령 예산으로 나눈 프레임의 k번째 조각은 k틱 뒤에 실행한다 (다음 프레임 전의 빈 틱이므로 프레임 스코어는 그대로)
+        self.split_pending_frames(score_interpolation)
+        dispatch_entries = []
+        for key in score_interpolation:
+            score, frame_name = score_interpolation[key], f"f{self.frame_aliases.get(key, key)}"
+            dispatch_entries.append((score, score, frame_name))
+            dispatch_entries.extend((score + k, score + k, f"{FRAME_SPLIT_FOLDER}/{frame_name}_{k}")
+                                    for k in range(1, self.frame_chunks.get(frame_name, 1)))
+        if self.tick_budget is not None or self.profiler.enabled:
+            self.report_tick_commands(dispatch_entries, max(score_interpolation.values()))
+        self.dispatcher_path = file_path
+        self.dispatch_scores = (min(low for low, _, _ in dispatch_entries), max(high for _, high, _ in dispatch_entries))
+        if self.playback_mode == 1:
+            self.write_frame_storage(file_path, dispatch_entries)
+            return
+        nodes = {}
+        if self.frame_dedup_mode == 1:
+            dispatch_entries, nodes = self.collapse_frame_loops(dispatch_entries)
+
+        if self.dispatcher_mode == 1:
+            # 범위 검사 트리로 나눠 틱마다 O(log F)개의 스코어 검사만 하도록 함
+            frame_lines, tree_nodes = build_frame_tree(dispatch_entries, self.temporary_player_name, self.scoreboard_name,
+                                                       self.namespace)
+            nodes.update(tree_nodes)
         else:
-            default_interpolation_value = default_interpolation_value_input
-
-
-        current_score += s_value if s_value else 1  # s가 없으면 1 증가
-
-        if s_value == 0:
-            score_interpolation[extracted_number] = current_score - tttal - 1
+            frame_lines = [f"execute if score {self.temporary_player_name} {self.scoreboard_name} matches "
+                           f"{low if low == high else f'{low}..{high}'} run function {self.namespace}{function_name}"
+                           for low, high, function_name in dispatch_entries]
+        # 트리 노드와 반복 구간 노드는 f숫자 파일과 같은 네임스페이스 경로에 저장
+        for node_name, node_lines in nodes.items():
+            node_path = os.path.join(self.function_folder, f"{node_name}.mcfunction")
+            if self.datapack is None:
+                os.makedirs(os.path.dirname(node_path), exist_ok=True)
+            self.write_function(node_path, node_lines, self.function_folder)
+        self.write_function(file_path, frame_lines, dispatcher_folder)
+
+    # 재생 방식 1: 스코어마다 그 스코어에 실행할 프레임 명령을 data storage 목록으로 넣는 함수와
+    # 이번 스코어의 목록을 꺼내 하나씩 실행하는 frame 파일, 재생 함수를 저장하는 함수
+    # (같은 스코어의 항목은 디스패처 순서대로 이어 붙이고, 디스패처 트리와 반복 구간 접기는 쓰지 않는다)
+    def write_frame_storage(self, file_path, dispatch_entries):
+        score_commands = {}
+        for score, _, function_name in dispatch_entries:
+            score_commands.setdefault(score, []).extend(self.frame_commands.get(function_name, ()))
+        setup_lines, frame_lines, player_functions = build_frame_storage_functions(
+            score_commands, self.temporary_player_name, self.scoreboard_name, self.namespace)
+        player_functions[FRAME_SETUP_FUNCTION] = setup_lines
+        for function_name, lines in player_functions.items():
+            self.write_function(os.path.join(self.function_folder, f"{function_name}.mcfunction"), lines, self.function_folder)
+        self.write_function(file_path, frame_lines, os.path.dirname(file_path))
+        print(f"프레임 데이터: 스코어 {sum(1 for commands in score_commands.values() if commands)}개, "
+              f"변환할 때마다 월드에서 {self.namespace}{FRAME_SETUP_FUNCTION} 함수를 한 번 실행하세요.")
+
+    # 출력된 함수를 디스패처의 스코어 범위에서 틱마다 따라가며 비용을 세어 보고서를 저장하고 요약을 출력하는 함수 (--analyze)
+    # 틱당 명령 예산이 있으면 그 값을, 없으면 COST_WARNING_COMMANDS를 기준으로 무거운 틱을 표시한다
+    def analyze_output(self, report_path, zip_path=None):
+        if self.dispatcher_path is None:
+            print("비용을 분석할 frame 파일이 없습니다.")
+            return
+        dispatcher_name = os.path.splitext(os.path.basename(self.dispatcher_path))[0]
+        if zip_path:
+            function_root = datapack_function_root(self.namespace)
+            with zipfile.ZipFile(zip_path) as zip_file:
+                functions = {name[len(function_root):-len('.mcfunction')]: zip_file.read(name).decode('utf-8').splitlines()
+                             for name in zip_file.namelist() if name.startswith(function_root) and name.endswith('.mcfunction')}
+            read_function = functions.get
+            frame_lines = functions.get(dispatcher_name, [])
         else:
-            score_interpolation[extracted_number] = current_score - tttal
-
-        
-
-        # 현재 파일에 대해 바로 적용할 시작값 설정
-        current_start_value = current_score if scoreboard_name else None
-
-        with open(bdengine_file, 'rb') as f:
-            decoded_data = base64.b64decode(f.read())
-        decompressed_data = gzip.decompress(decoded_data)
-        text_data = decompressed_data.decode('utf-8')
-
-        try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
-            continue
-
-        results = []
-
-        for item in data:
-            temp = handle_top_level_data(item, mode, default_interpolation_value, temporary_player_name, scoreboard_name, current_start_value)
-            results.extend(temp)
-
-        current_tags = set()
-        current_transformations = {}
-
-        # 결과 필터링
-        filtered_lines = []
-        for line in results:
-            # 'execute if score None None run' 부분만 제거
-            line = line.replace("execute if score   matches None run", "")
-            line = line.replace("if score   matches None ", "")
-
-            tag_matches = tag_pattern.findall(line)
-            if len(tag_matches) > 0 : selector_key = tag_matches[0]
-            uuid_matches = uuid_pattern.findall(line)
-            if len(uuid_matches) > 0 : selector_key = uuid_matches[0]
-        # 결과 필터링
-        filtered_lines = []
-        for line in results:
-            # 'execute if score None None run' 부분만 제거
-            line = line.replace("execute if score   matches None run", "")
-        
-            tag_matches = tag_pattern.findall(line)
-            if len(tag_matches) > 0: 
-                selector_key = tag_matches[0]
-            
-            uuid_matches = uuid_pattern.findall(line)
-            if len(uuid_matches) > 0: 
-                selector_key = uuid_matches[0]
-        
-            # transformation_pattern.search(line)이 None이 아닌지 체크
-            transformation_match = transformation_pattern.search(line)
-            if transformation_match:  # 만약 match가 존재하면
-                transformation_str = transformation_match[0]
+            def read_function(name):
+                function_path = os.path.join(self.function_folder, f"{name}.mcfunction")
+                if not os.path.isfile(function_path):
+                    return None
+                with open(function_path, 'r', encoding='utf-8') as f:
+                    return f.read().splitlines()
+            with open(self.dispatcher_path, 'r', encoding='utf-8') as f:
+                frame_lines = f.read().splitlines()
+        analyzer = CostAnalyzer(read_function, self.namespace, self.temporary_player_name)
+        low, high = self.dispatch_scores
+        for score in range(low, high + 1):
+            analyzer.analyze_tick(frame_lines, score)
+        threshold = self.tick_budget or COST_WARNING_COMMANDS
+        analyzer.write_report(report_path, threshold)
+        analyzer.print_summary(threshold)
+        if self.mode == 0:
+            print("생성모드 0은 frame 파일을 실행하는 엔티티마다 위 비용이 한 번씩 듭니다.")
+
+    # 스코어(틱)마다 디스패처가 실행하는 프레임 명령 수를 세어 보고하는 함수 (디스패처의 스코어 검사는 빼고 셈)
+    def report_tick_commands(self, dispatch_entries, last_score):
+        tick_commands = {}
+        for score, _, function_name in dispatch_entries:
+            tick_commands[score] = tick_commands.get(score, 0) + self.function_costs.get(function_name, 0)
+        self.profiler.count_ticks(tick_commands)
+        if self.tick_budget is None or not tick_commands:
+            return
+        busiest = max(tick_commands, key=tick_commands.get)
+        over_budget = sum(1 for commands in tick_commands.values() if commands > self.tick_budget)
+        split_frames = sum(1 for chunk_count in self.frame_chunks.values() if chunk_count > 1)
+        print(f"틱당 명령: 최대 {tick_commands[busiest]}개 (스코어 {busiest}), 예산 {self.tick_budget}개를 넘는 틱 {over_budget}개, "
+              f"나눈 프레임 {split_frames}개")
+        overflow = sum(1 for score, _, function_name in dispatch_entries
+                       if score > last_score and function_name.startswith(FRAME_SPLIT_FOLDER))
+        if overflow:
+            print(f"마지막 프레임의 스코어({last_score})보다 뒤에 실행되는 조각 {overflow}개: 스코어가 그만큼 더 올라가야 실행됩니다.")
+
+    # 디스패처 항목에서 같은 주기로 되풀이되는 구간을 반복 구간 노드 하나로 접는 함수
+    # 접힌 항목 대신 구간 전체의 스코어 범위로 노드를 부르는 항목 하나를 넣은 항목 목록과 {노드 이름: 라인 목록}을 반환
+    def collapse_frame_loops(self, dispatch_entries):
+        order = sorted(range(len(dispatch_entries)), key=lambda index: dispatch_entries[index][0])
+        entries = [(dispatch_entries[index][0], dispatch_entries[index][2]) for index in order]
+        loop_entries = {}  # 접힌 첫 항목의 위치 -> 반복 구간 노드를 부르는 항목
+        collapsed = set()
+        nodes = {}
+        for start, period, end in find_frame_loops(entries):
+            first_cycle = entries[start:start + period]
+            low, high = entries[start + period][0], entries[end - 1][0]
+            node_name = f"{FRAME_LOOP_FOLDER}/{low}_{high}"
+            lines, cycle_entries = build_frame_loop_lines(first_cycle, entries[start + period][0] - entries[start][0],
+                                                          self.temporary_player_name, self.scoreboard_name)
+            if self.dispatcher_mode == 1:
+                cycle_lines, cycle_nodes = build_frame_tree(cycle_entries, FRAME_LOOP_HOLDER, self.scoreboard_name, self.namespace,
+                                                            node_name)
+                nodes.update(cycle_nodes)
             else:
-                # transformation_str을 처리할 기본값 설정 또는 다른 처리
-                transformation_str = ""  # 예시로 빈 문자열 처리
-        
-            head_value_matches = head_value_pattern.findall(line)
-            
-            # 이후 코드에서 transformation_str을 사용하는 부분
-            # 예를 들어 필터링을 위한 추가 조건을 넣는 코드 작성
-        
-            
-            # 현재 Tag와 transformation 추가
-            current_tags.add(selector_key)
-            current_transformations[selector_key] = transformation_str
-
-            # 중복되는지 확인
-            is_head = True
-            if len(head_value_matches) == 0 or (not first_file and selector_key in previous_tags and
-                    head_value_matches[0] == previous_head_values.get(selector_key)):
-                # 중복이니 head_value 지우기
-                is_head = False
-                if len(head_value_matches) != 0: line = line.replace(head_value_matches[0], "") 
-
-
-            # 중복되는지 확인
-            is_transformation = True
-            if (not first_file and selector_key in previous_tags and
-                    transformation_str == previous_transformations.get(selector_key)):
-                # 중복이니 transformation 지우기
-                is_transformation = False
-                line = line.replace(transformation_str, "")
-                line = re.sub(r"start_interpolation: \d+, interpolation_duration: \d+", "", line)
-                line = line.replace("data merge entity", "item replace entity")
-                line = re.sub(r"@e\[(.*?)\]", lambda m: f"@e[{m.group(1)}] container.0 with player_head[profile={{properties:[{{name:\"textures\",value:\"", line)
-                line = re.sub(r'{, item:{id:player_head,components:{"profile":{properties:\[{name:textures,value:"', '', line)
-                line = re.sub(r'\}]}}}}', '}]}]', line)
-                line = re.sub(r'item replace entity @s ', 'item replace entity @s container.0 with player_head[profile={properties:[{name:\"textures\",value:\"', line)
-                line = re.sub(r'item replace entity ([a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*-[a-z0-9]*)', 
-              r'item replace entity \g<1> container.0 with player_head[profile={properties:[{name:"textures",value:"', 
-              line)
-                line = re.sub(r'value:" ', 'value:"', line)
-            # 머리, trans 둘 다 안 들어가면 추가 하지 않기
-            if not is_head and not is_transformation: continue
-
-            if is_head and len(head_value_matches) != 0: current_head_values[selector_key] = head_value_matches[0]
-            if is_transformation: current_transformations[selector_key] = transformation_str
-
-            filtered_lines.append(line.strip())  # 공백 제거 후 추가
-        filtered_results = [line for line in filtered_lines if line]  # 빈 줄은 제거
-
-        previous_tags = current_tags
-        previous_transformations = current_transformations
-        previous_head_values = current_head_values
-        score_interpolation_list = []
-    
-        # 파일 이름에서 숫자 추출
-        extracted_number = extract_number_from_filename(bdengine_file)
-
-        # 저장 경로 결정
-        if save_dnlcl == "":
-            # save_dnlcl이 None이면 result_folder 경로 사용
-            txt_file_path = os.path.join(result_folder, f"f{extracted_number}.mcfunction")
-        else:
-            # save_dnlcl이 None이 아니면 save_dnlcl 경로 사용
-            txt_file_path = os.path.join(save_dnlcl, f"f{extracted_number}.mcfunction")
-        
-        # .mcfunction 파일로 결과 저장
-        with open(txt_file_path, 'w', encoding='utf-8') as txt_file:
-            for line in filtered_results:
-                txt_file.write(line + '\n')
-
-                
- 
-    if not score_interpolation_list:
-        # 딕셔너리의 키-값 쌍을 튜플로 만들어 리스트로 변환
-        score_interpolation_list = list(score_interpolation.items())
-        score_interpolation_list[1] = (score_interpolation_list[1][0], score_interpolation_list[1][1])
-        #끼에엑 여기만 좀 건들이면 해결
-        if s_value == 0:
-            score_interpolation[extracted_number] = score_interpolation_list[-1][1] + 1
+                cycle_lines = [f"execute if score {FRAME_LOOP_HOLDER} {self.scoreboard_name} matches {offset} run function {self.namespace}{function_name}"
+                               for offset, _, function_name in cycle_entries]
+            nodes[node_name] = lines + cycle_lines
+            positions = [order[k] for k in range(start + period, end)]
+            collapsed.update(positions)
+            loop_entries[min(positions)] = (low, high, node_name)
+        if loop_entries:
+            print(f"반복 구간 {len(loop_entries)}개: 디스패처 항목 {len(collapsed)}개를 접음")
+        return [loop_entries.get(index, entry) for index, entry in enumerate(dispatch_entries)
+                if index in loop_entries or index not in collapsed], nodes
+
+
+# setting.txt를 읽어 작업 폴더의 애니메이션을 변환하는 함수 (명령줄과 감시 모드에서 사용)
+# build_cache를 넘기면 메모리에 있는 빌드 캐시를 이어서 쓰고, 갱신된 캐시를 돌려준다
+def process_bdengine_file(jobs=1, cache_path=None, profile_path=None, stream=False, build_cache=None, file_signatures=None,
+                          setting_path='setting.txt', input_folder='.', output_folder='result', zip_path=None, analyze_path=None,
+                          compiled_path=None):
+    # 설정 값 불러오기
+    config = load_config(setting_path)  # setting.txt 파일에서 설정값을 읽어옴
+    if not config:
+        print("설정 값을 불러오는 데 실패했습니다.")
+        return build_cache
+    print(f"설정 값 불러오기 성공: {config}")
+
+    converter = Converter(config, input_folder, output_folder)
+    build_cache = converter.run(jobs, cache_path, profile_path, stream, build_cache, file_signatures, zip_path, compiled_path)
+    if analyze_path:
+        converter.analyze_output(analyze_path, zip_path)
+    return build_cache
+
+# 감시 모드에서 작업 폴더를 확인하는 간격(초)
+WATCH_INTERVAL = 0.2
+
+# 입력 폴더의 f숫자 .bdengine 파일과 설정 파일의 {경로: (수정 시각, 크기)}를 구하는 함수
+def snapshot_watch_files(input_folder='.', setting_path='setting.txt'):
+    snapshot = {}
+    for entry in os.scandir(input_folder):
+        if entry.is_file() and re.search(r'f\d+.*\.bdengine$', entry.name):
+            stat = entry.stat()
+            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    if os.path.isfile(setting_path):
+        stat = os.stat(setting_path)
+        snapshot[setting_path] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+# 작업 폴더를 감시하며 파일이 바뀔 때마다 다시 변환하는 함수 (--watch, Ctrl+C로 종료)
+# 디코딩한 프레임 상태와 출력 파일 해시를 메모리에 두고, 바뀐 프레임만 다시 디코딩하며 내용이 바뀐 출력 파일만 다시 쓴다
+# 비교와 명령 생성은 일부러 모든 프레임에 다시 한다. 프레임의 출력은 앞 프레임까지 보낸 상태(분해 성분, 루트 모션,
+# 머리 텍스처 번호, 중복 프레임, 엔티티 번호)와 다음 프레임의 스코어(틱당 예산으로 나눈 조각)에 달려 있어서,
+# 바뀐 프레임과 그다음 프레임만 다시 만들면 한 번에 변환한 결과와 달라질 수 있다 (디코딩보다 훨씬 가벼운 단계)
+def watch_bdengine_files(jobs=1, cache_path=None, interval=WATCH_INTERVAL, setting_path='setting.txt', input_folder='.',
+                         output_folder='result', zip_path=None, analyze_path=None):
+    build_cache = load_build_cache(cache_path, None)  # 설정 키는 첫 변환에서 채워짐
+    file_signatures = {}
+    snapshot = None
+    print("작업 폴더를 감시합니다. (Ctrl+C로 종료)")
+    try:
+        while True:
+            current_snapshot = snapshot_watch_files(input_folder, setting_path)
+            if current_snapshot != snapshot:
+                # BDEngine이 파일을 쓰는 도중일 수 있으므로 한 번 더 기다려 그대로일 때만 변환
+                time.sleep(interval)
+                if snapshot_watch_files(input_folder, setting_path) != current_snapshot:
+                    continue
+                snapshot = current_snapshot
+                start = time.perf_counter()
+                try:
+                    build_cache = process_bdengine_file(jobs, cache_path, build_cache=build_cache, file_signatures=file_signatures,
+                                                        setting_path=setting_path, input_folder=input_folder,
+                                                        output_folder=output_folder, zip_path=zip_path,
+                                                        analyze_path=analyze_path)
+                except Exception as error:  # 잘못된 프레임이 있어도 감시는 계속
+                    print(f"변환 실패: {error!r}")
+                else:
+                    print(f"변환 완료 ({(time.perf_counter() - start) * 1000:.0f}ms)")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("감시를 끝냅니다.")
+
+# 일괄 변환 목록의 애니메이션 하나 (입력 폴더, 설정 파일, 기본 출력 폴더, 데이터팩 .zip 경로 또는 None)
+BatchAnimation = namedtuple('BatchAnimation', ['input_folder', 'setting_path', 'output_folder', 'zip_path'])
+
+# 일괄 변환 목록(JSON 배열)을 읽는 함수
+# 항목은 입력 폴더 이름이나 {"input", "settings", "output", "zip"} 객체로, input은 목록 파일이 있는 폴더 기준이고
+# 나머지는 입력 폴더 기준 경로 (기본값 setting.txt, result, .zip 출력 없음)
+# 네임스페이스, 스코어보드, 저장 위치는 애니메이션마다 자기 설정 파일에서 읽고 (저장 위치도 입력 폴더 기준),
+# 두 애니메이션의 출력 위치가 겹치면 ValueError
+def load_batch_manifest(manifest_path):
+    base_folder = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    animations = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'input': entry}
+        input_folder = os.path.join(base_folder, entry['input'])
+        animations.append(BatchAnimation(input_folder, os.path.join(input_folder, entry.get('settings', 'setting.txt')),
+                                         os.path.join(input_folder, entry.get('output', 'result')),
+                                         os.path.join(input_folder, entry['zip']) if entry.get('zip') else None))
+
+    # 두 애니메이션의 출력이 같은 폴더(.zip 출력이면 같은 .zip)로 가면 서로의 파일을 지우고 덮어쓰므로 거부
+    owners = {}
+    for animation in animations:
+        if animation.zip_path:
+            targets = [animation.zip_path]
         else:
-            score_interpolation[extracted_number] = score_interpolation_list[-1][1] + s_value
+            config = load_batch_config(animation) or {}
+            targets = [animation.output_folder] + [config[key] for key in BATCH_PATH_KEYS if config.get(key)]
+        for target in {os.path.normcase(os.path.abspath(target)) for target in targets}:
+            owner = owners.setdefault(target, animation.input_folder)
+            if owner != animation.input_folder:
+                raise ValueError(f"{owner}와 {animation.input_folder}의 출력 위치가 같습니다: {target}")
+    return animations
+
+# 일괄 변환에서 입력 폴더 기준으로 읽는 설정 파일의 저장 위치 키
+BATCH_PATH_KEYS = ('frame저장위치(선택)', 'score저장위치(선택)')
+
+# 일괄 변환에서 애니메이션 하나의 설정을 읽는 함수 (설정 파일이 없으면 None)
+# 저장 위치의 상대 경로는 현재 폴더가 아니라 애니메이션의 입력 폴더 기준으로 바꾼다
+def load_batch_config(animation):
+    config = load_config(animation.setting_path)
+    if config:
+        for key in BATCH_PATH_KEYS:
+            if config.get(key):
+                config[key] = os.path.join(animation.input_folder, config[key])
+    return config
+
+# 일괄 변환 워커 프로세스 안에서 애니메이션끼리 함께 쓰는 행렬 양자화 표
+BATCH_MATRIX_TABLES = {}
+
+# 일괄 변환 결과 (출력 메시지, 실제 시간, CPU 시간, 프레임 수, 성공 여부)
+BatchResult = namedtuple('BatchResult', ['log', 'wall', 'cpu', 'frames', 'succeeded'])
+
+# 일괄 변환에서 애니메이션 하나를 변환하는 함수 (워커 프로세스에서 실행)
+# 캐시와 보고서 파일은 애니메이션의 입력 폴더에 두고, 출력 메시지는 모아서 돌려주므로 여러 애니메이션의 메시지가 섞이지 않는다
+def convert_batch_animation(animation, cache_name=None, profile_name=None, stream=False, analyze_name=None, compiled_name=None):
+    log = io.StringIO()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    frame_count = 0
+    succeeded = False
+    with redirect_stdout(log):
+        try:
+            config = load_batch_config(animation)
+            if not config:
+                print("설정 값을 불러오는 데 실패했습니다.")
+            else:
+                converter = Converter(config, animation.input_folder, animation.output_folder, BATCH_MATRIX_TABLES)
+                frame_count = len(set(converter.list_frame_files()))
+                converter.run(1, os.path.join(animation.input_folder, cache_name) if cache_name else None,
+                              os.path.join(animation.input_folder, profile_name) if profile_name else None,
+                              stream, zip_path=animation.zip_path,
+                              compiled_path=os.path.join(animation.input_folder, compiled_name) if compiled_name else None)
+                if analyze_name:
+                    converter.analyze_output(os.path.join(animation.input_folder, analyze_name), animation.zip_path)
+                succeeded = True
+        except Exception as error:  # 한 애니메이션이 실패해도 나머지는 계속 변환
+            print(f"변환 실패: {error!r}")
+    return BatchResult(log.getvalue(), time.perf_counter() - wall_start, time.process_time() - cpu_start,
+                       frame_count, succeeded)
+
+# 일괄 변환 목록의 애니메이션들을 프로세스 풀에서 동시에 변환하고 전체 시간 요약을 출력하는 함수 (--batch)
+# 워커 하나가 애니메이션 하나를 통째로 변환하고, 같은 워커가 맡은 애니메이션끼리는 행렬 양자화 표를 이어서 쓴다
+# (머리 텍스처 표는 번호가 애니메이션마다 자기 저장소에 들어가므로 애니메이션마다 따로 만든다)
+def process_batch(manifest_path, jobs=1, cache_path=None, profile_path=None, stream=False, analyze_path=None, compiled_path=None):
+    try:
+        animations = load_batch_manifest(manifest_path)
+    except ValueError as error:
+        print(f"일괄 변환 목록을 읽지 못했습니다: {error}")
+        return
+    options = (os.path.basename(cache_path) if cache_path else None, os.path.basename(profile_path) if profile_path else None,
+               stream, os.path.basename(analyze_path) if analyze_path else None,
+               os.path.basename(compiled_path) if compiled_path else None)
+    start = time.perf_counter()
+    results = []
 
+    def report(animation, result):
+        print(f"[{animation.input_folder}]")
+        print(result.log, end='')
+        results.append(result)
 
+    if jobs > 1 and len(animations) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(animations))) as executor:
+            futures = [executor.submit(convert_batch_animation, animation, *options) for animation in animations]
+            for animation, future in zip(animations, futures):
+                report(animation, future.result())
     else:
-        # score_interpolation_list가 비어 있지 않다면 빈 리스트로 초기화
-        score_interpolation_list = []
-
-    # 저장 경로 결정
-    if not save_dnlcl_ifsocre:  # save_dnlcl_ifsocre가 None이거나 빈 문자열이면
-        # save_dnlcl_ifsocre가 None이거나 빈 문자열이면 result_folder 경로 사용
-        if not frame_file_savename or frame_file_savename.strip() == "":  # frame_file_savename이 None이나 빈 문자열인 경우
-            file_path = os.path.join(result_folder, "frame.mcfunction")
-        else:  # frame_file_savename이 존재하는 경우
-            file_path = os.path.join(result_folder, f"{frame_file_savename}.mcfunction")
-    else:
-        # save_dnlcl_ifsocre가 None도 아니고 빈 문자열도 아니면 save_dnlcl_ifsocre 경로 사용
-        if not frame_file_savename or frame_file_savename.strip() == "":  # frame_file_savename이 None이나 빈 문자열인 경우
-            file_path = os.path.join(save_dnlcl_ifsocre, "frame.mcfunction")
-        else:  # frame_file_savename이 존재하는 경우
-            file_path = os.path.join(save_dnlcl_ifsocre, f"{frame_file_savename}.mcfunction")
+        for animation in animations:
+            report(animation, convert_batch_animation(animation, *options))
+
+    elapsed = time.perf_counter() - start
+    total_wall = sum(result.wall for result in results)
+    print("일괄 변환 요약 (실제 / CPU):")
+    for animation, result in zip(animations, results):
+        print(f"  {animation.input_folder:<30} {result.wall:8.3f}s / {result.cpu:8.3f}s  프레임 {result.frames}개"
+              f"{'' if result.succeeded else '  실패'}")
+    print(f"애니메이션 {len(results)}개 (실패 {sum(1 for result in results if not result.succeeded)}개), "
+          f"프레임 {sum(result.frames for result in results)}개: 걸린 시간 {elapsed:.3f}s, "
+          f"애니메이션별 시간 합 {total_wall:.3f}s ({total_wall / (elapsed or 1.0):.2f}배)")
     
 
 
-    # 파일에 결과 저장
-    with open(file_path, 'w', encoding='utf-8') as txt_file:  # 'w' 모드로 변경
-        for key in score_interpolation:
-            # 텍스트 작성
-            txt_file.write(f"execute if score {temporary_player_name} {scoreboard_name} matches {score_interpolation[key]} run function {namespace}f{key}\n")
-    
-
-
-process_bdengine_file()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BDEngine 애니메이션을 mcfunction으로 변환합니다.')
+    parser.add_argument('--jobs', type=int, default=1, help='프레임 디코딩에 사용할 프로세스 수 (0이면 CPU 코어 수)')
+    parser.add_argument('--cache', nargs='?', const='bdengine_cache.pickle', default=None, metavar='PATH',
+                        help='빌드 캐시를 사용해 바뀐 프레임만 다시 변환 (기본 경로 bdengine_cache.pickle)')
+    parser.add_argument('--stream', action='store_true',
+                        help='프레임을 조각 단위로 읽고 명령을 바로 파일에 써서 메모리 사용량을 줄임 (--jobs, --cache와 함께 쓸 수 없음)')
+    parser.add_argument('--watch', action='store_true',
+                        help='작업 폴더를 감시하며 .bdengine 파일이나 setting.txt가 바뀔 때마다 바뀐 부분만 다시 변환')
+    parser.add_argument('--profile', nargs='?', const='conversion_report.json', default=None, metavar='PATH',
+                        help='단계별 시간과 프레임 통계를 JSON으로 저장하고 요약 출력 (기본 경로 conversion_report.json)')
+    parser.add_argument('--zip', nargs='?', const='datapack.zip', default=None, metavar='PATH',
+                        help='결과를 폴더 대신 데이터팩 .zip 하나로 저장 (기본 경로 datapack.zip, --stream과 함께 쓸 수 없음)')
+    parser.add_argument('--analyze', nargs='?', const='cost_report.json', default=None, metavar='PATH',
+                        help='변환 결과를 틱마다 따라가며 명령 비용을 JSON으로 저장하고 무거운 틱을 표시 (기본 경로 cost_report.json)')
+    parser.add_argument('--compiled', nargs='?', const='frames.bdframes', default=None, metavar='PATH',
+                        help='디코딩한 프레임을 바이너리 파일 하나로 컴파일해 두고 다음 실행부터 mmap으로 읽음 '
+                             '(원본이 바뀐 프레임만 다시 컴파일, 기본 경로 frames.bdframes, --cache, --stream, --watch와 함께 쓸 수 없음)')
+    parser.add_argument('--settings', default='setting.txt', metavar='PATH', help='설정 파일 경로 (기본값 setting.txt)')
+    parser.add_argument('--input', default='.', metavar='DIR', help='f숫자 .bdengine 파일이 있는 폴더 (기본값 현재 폴더)')
+    parser.add_argument('--output', default='result', metavar='DIR', help='기본 출력 폴더 (기본값 result)')
+    parser.add_argument('--batch', default=None, metavar='MANIFEST',
+                        help='JSON 목록의 애니메이션 폴더들을 한꺼번에 변환 (--jobs는 동시에 변환할 애니메이션 수, '
+                             '--cache, --profile, --analyze, --compiled는 각 입력 폴더에 저장)')
+    args = parser.parse_args()
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if args.batch and (args.watch or args.zip):
+        parser.error('--batch는 --watch, --zip과 함께 쓸 수 없습니다. (.zip 출력은 목록의 zip 항목으로 지정)')
+    if args.stream and (args.cache or (args.jobs != 1 and not args.batch) or args.watch or args.zip):
+        parser.error('--stream은 --jobs, --cache, --watch, --zip과 함께 쓸 수 없습니다.')
+    if args.compiled and (args.cache or args.stream or args.watch):
+        parser.error('--compiled는 --cache, --stream, --watch와 함께 쓸 수 없습니다.')
+    if args.batch:
+        process_batch(args.batch, jobs=jobs, cache_path=args.cache, profile_path=args.profile, stream=args.stream,
+                      analyze_path=args.analyze, compiled_path=args.compiled)
+    elif args.watch:
+        watch_bdengine_files(jobs=jobs, cache_path=args.cache, setting_path=args.settings, input_folder=args.input,
+                             output_folder=args.output, zip_path=args.zip, analyze_path=args.analyze)
+    else:
+        process_bdengine_file(jobs=jobs, cache_path=args.cache, profile_path=args.profile, stream=args.stream,
+                              setting_path=args.settings, input_folder=args.input, output_folder=args.output, zip_path=args.zip,
+                              analyze_path=args.analyze, compiled_path=args.compiled)